@@ -0,0 +1,118 @@
+"""
+Compares the float32 embedding store with the float16 and int8 stores on
+the sentences of the example images in static/img/examples. Reports the
+memory of each store, the scoring latency and the overlap of the top
+sentences (the ones questions are made from) with float32.
+
+The sentences are read with the Vision and NLP APIs, so
+GOOGLE_APPLICATION_CREDENTIALS has to be set unless they are given with
+--sentences (a json file of {image: [sentence]} written by --save).
+
+Usage:
+    python -m lib.scripts.embeddings glove.6B.100d.txt
+    python benchmarks/bench_quantized_embeddings.py [--sentences FILE] [--save FILE]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib.Cache import LRUCache
+from lib.scripts import embeddings
+from lib.scripts import text_summarize
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static', 'img', 'examples')
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+# same fraction of sentences as Document.questions_from_sentlist
+TOP_FRACTION = 0.3
+
+
+def get_example_images():
+    image_paths = []
+    for root, dirs, files in os.walk(EXAMPLES_DIR):
+        image_paths.extend([os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXTS)])
+    return sorted(image_paths)
+
+def read_sentences(image_path):
+    """
+    Reads the sentences of the image with the OCR and NLP pipeline
+    """
+    from lib.Vision import Vision
+    from lib.Sentence import Sentence
+
+    with io.open(image_path, 'rb') as image_file:
+        vis = Vision(image_file, True)
+    if not hasattr(vis, 'word_list'):
+        return []
+
+    sentences = []
+    for paragraph in vis.paragraph_helper.get_paragraph_list():
+        sentences.extend([str(sentence) for sentence in
+            Sentence.get_sentences_from_paragraph(paragraph['word_list'], paragraph['entity_list'], paragraph['syntax_list'])])
+    return sentences
+
+def get_store(word_embeddings, dtype):
+    """
+    Quantizes the float32 store in memory so the benchmark does not need the quantized files
+    """
+    vectors, scales = embeddings.quantize(np.asarray(word_embeddings.vectors), dtype)
+    return embeddings.WordEmbeddings(word_embeddings.vocab, vectors, scales)
+
+def time_scores(word_embeddings, sentences, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        # every run misses the sentence vector cache
+        text_summarize.sentence_vector_cache = LRUCache(max_items=0)
+        start = time.perf_counter()
+        scores = text_summarize.get_sent_scores(word_embeddings, sentences)
+        best = min(best, time.perf_counter() - start)
+    return scores, best
+
+def get_top_overlap(scores, ref_scores):
+    num_top = max(int(len(scores) * TOP_FRACTION), 1)
+    top = set(np.argsort(-scores, kind='stable')[:num_top])
+    ref_top = set(np.argsort(-ref_scores, kind='stable')[:num_top])
+    return len(top & ref_top) / num_top
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sentences', help='json file with the sentences of each image')
+    parser.add_argument('--save', help='saves the sentences read from the images to this json file')
+    args = parser.parse_args()
+
+    if args.sentences:
+        with open(args.sentences) as f:
+            image_sentences = json.load(f)
+    else:
+        image_sentences = { os.path.relpath(path, EXAMPLES_DIR): read_sentences(path) for path in get_example_images() }
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump(image_sentences, f, indent=2)
+
+    float32_store = embeddings.load()
+    stores = { dtype: float32_store if dtype == 'float32' else get_store(float32_store, dtype) for dtype in embeddings.DTYPES }
+
+    print('%8s %14s' % ('store', 'memory (MB)'))
+    for dtype in embeddings.DTYPES:
+        print('%8s %14.1f' % (dtype, stores[dtype].get_nbytes() / 1e6))
+    print('')
+
+    print('%-36s %10s %8s %10s %14s' % ('image', 'sentences', 'store', 'time (ms)', 'top overlap'))
+    for image, sentences in sorted(image_sentences.items()):
+        if len(sentences) < 2:
+            print('%-36s %10d %8s' % (image, len(sentences), 'skipped'))
+            continue
+
+        ref_scores = None
+        for dtype in embeddings.DTYPES:
+            scores, elapsed = time_scores(stores[dtype], sentences)
+            if ref_scores is None:
+                ref_scores = scores
+            print('%-36s %10d %8s %10.2f %14.3f' % (image, len(sentences), dtype, elapsed * 1000, get_top_overlap(scores, ref_scores)))
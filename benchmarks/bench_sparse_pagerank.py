@@ -0,0 +1,89 @@
+"""
+Compares the dense and the sparse top k sentence scoring on synthetic
+sentence vectors grouped into topics like the sentences of a long document.
+Reports the time, the size of the similarity matrix, the peak memory and
+the overlap of the top ranked sentences with the dense scores.
+
+The sparse scores add the rank one residual of the links left out of the
+top k graph, which keeps the ranking close to the dense one. The "top k"
+rows run PageRank on the top k graph alone to show how far off it is.
+
+The sparse path bounds the memory, not the time. Selecting the top k
+still compares every pair of sentences, so the time grows with n^2 like
+the dense path (about 4.5 s at 20000 sentences). Below
+text_summarize.SPARSE_MIN_SENTENCES one block holds the whole matrix, so
+the sparse path saves no memory there and is slower.
+
+Usage:
+    python benchmarks/bench_sparse_pagerank.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib.scripts import text_summarize
+
+SIZES = [500, 1000, 2000, 5000, 20000]
+# the dense matrix of more sentences does not fit in memory comfortably
+MAX_DENSE_SENTENCES = 5000
+TOP_K = text_summarize.SPARSE_TOP_K
+
+
+def make_sentence_vectors(num_sentences, num_topics=50, dim=100, seed=0):
+    rng = np.random.RandomState(seed)
+    topics = rng.normal(size=(num_topics, dim)) + 1.0
+    topic_ids = rng.randint(num_topics, size=num_sentences)
+    return topics[topic_ids] + rng.normal(scale=1.0, size=(num_sentences, dim))
+
+def get_matrix_bytes(sim_mat):
+    if hasattr(sim_mat, 'indptr'):
+        return sim_mat.data.nbytes + sim_mat.indices.nbytes + sim_mat.indptr.nbytes
+    return sim_mat.nbytes
+
+def score(sentence_vectors, get_matrix):
+    tracemalloc.start()
+    start = time.perf_counter()
+    sim_mat, residual = get_matrix(sentence_vectors)
+    scores = text_summarize.pagerank(sim_mat, residual)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return scores, elapsed, get_matrix_bytes(sim_mat), peak
+
+def get_overlap(scores, ref_scores, fraction):
+    """
+    Fraction of the top sentences of the reference that are also in the top sentences of `scores`
+    """
+    num_top = max(int(len(scores) * fraction), 1)
+    top = set(np.argsort(-scores, kind='stable')[:num_top])
+    ref_top = set(np.argsort(-ref_scores, kind='stable')[:num_top])
+    return len(top & ref_top) / num_top
+
+
+if __name__ == "__main__":
+    print('top k = %s, sparse from %s sentences' % (TOP_K, text_summarize.SPARSE_MIN_SENTENCES))
+    print('%8s %7s %10s %12s %12s %10s %10s' % ('n', 'mode', 'time (ms)', 'matrix (MB)', 'peak (MB)', 'top 30%', 'top 1%'))
+    for num_sentences in SIZES:
+        sentence_vectors = make_sentence_vectors(num_sentences)
+
+        dense_scores = None
+        if num_sentences <= MAX_DENSE_SENTENCES:
+            dense_scores, elapsed, matrix_bytes, peak = score(sentence_vectors, lambda v: (text_summarize.get_similarity_matrix(v), None))
+            print('%8d %7s %10.1f %12.2f %12.2f %10s %10s' % (num_sentences, 'dense', elapsed * 1000, matrix_bytes / 1e6, peak / 1e6, '-', '-'))
+
+        modes = [
+            ('sparse', lambda v: text_summarize.get_topk_similarity_matrix(v, TOP_K)),
+            ('top k', lambda v: (text_summarize.get_topk_similarity_matrix(v, TOP_K)[0], None))
+        ]
+        for mode, get_matrix in modes:
+            sparse_scores, elapsed, matrix_bytes, peak = score(sentence_vectors, get_matrix)
+            if dense_scores is not None:
+                overlap = ('%.3f' % get_overlap(sparse_scores, dense_scores, 0.3), '%.3f' % get_overlap(sparse_scores, dense_scores, 0.01))
+            else:
+                overlap = ('-', '-')
+            print('%8d %7s %10.1f %12.2f %12.2f %10s %10s' % ((num_sentences, mode, elapsed * 1000, matrix_bytes / 1e6, peak / 1e6) + overlap))
@@ -0,0 +1,67 @@
+"""
+Benchmarks the alignment of NLP tokens with the words of the text on
+synthetic texts. The time per token should stay flat as the text grows.
+
+Usage:
+    python benchmarks/bench_token_alignment.py
+"""
+from types import SimpleNamespace
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('NLP_CACHE_PATH', '')
+
+from lib.Word import Word
+
+WORDS = ['the', 'cell', 'membrane', "doesn't", 'regulate', 'transport', 'of', 'ions', 'café', 'Newton\'s', 'law.']
+SIZES = [1000, 5000, 10000, 50000, 100000]
+
+
+def make_token(content, begin_offset):
+    return SimpleNamespace(
+        text=SimpleNamespace(content=content, begin_offset=begin_offset),
+        part_of_speech=SimpleNamespace(tag=6))
+
+def make_text(num_words, seed=0):
+    """
+    Creates a text of `num_words` words and its tokens, splitting contractions,
+    possessives and punctuation into seperate tokens like the NLP lib does
+
+    Returns:
+        text (str), tokens (list)
+    """
+    rng = random.Random(seed)
+    words = [rng.choice(WORDS) for _ in range(num_words)]
+    tokens = []
+    offset = 0
+    for word in words:
+        parts = [word]
+        for suffix in ("n't", "'s", '.'):
+            if word.endswith(suffix) and word != suffix:
+                parts = [word[:-len(suffix)], suffix]
+                break
+        for part in parts:
+            tokens.append(make_token(part, offset))
+            offset += len(part.encode('utf-8'))
+        offset += 1
+    return ' '.join(words), tokens
+
+def bench(num_words, repeat=3):
+    text, tokens = make_text(num_words)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        word_obj_list = Word.get_syntax_list(text, tokens)
+        best = min(best, time.perf_counter() - start)
+    assert len(word_obj_list) == num_words
+    return len(tokens), best
+
+
+if __name__ == "__main__":
+    print('%10s %10s %12s %14s' % ('words', 'tokens', 'time (ms)', 'us per token'))
+    for num_words in SIZES:
+        num_tokens, elapsed = bench(num_words)
+        print('%10d %10d %12.1f %14.2f' % (num_words, num_tokens, elapsed * 1000, elapsed * 1e6 / num_tokens))
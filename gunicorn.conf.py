@@ -0,0 +1,21 @@
+import os
+
+# gunicorn settings used by the Dockerfile
+bind = ':%s' % os.environ.get('PORT', '8080')
+
+# request threads only wait on the OCR/NLP APIs and the pre-processing process
+# pool, so one heavy photo does not stall the whole instance
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+
+def post_fork(server, worker):
+    # starts the pre-processing processes first so they are not forked from
+    # a worker that already has gRPC threads, then opens the API client
+    # channels before the worker takes requests
+    from lib.Vision import Vision
+    from lib.scripts import clients
+    Vision.preprocess_pool.warmup()
+    clients.warmup()
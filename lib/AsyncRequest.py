@@ -3,68 +3,139 @@ from google.auth.transport import requests
 
 import aiohttp
 import asyncio
+import threading
 import os
 
 class AsyncRequest:
+    # the event loop, session and credentials are shared by all the request threads of a worker process
+    max_concurrency = int(os.environ.get('NLP_MAX_CONCURRENCY', 16))
+    timeout = float(os.environ.get('NLP_TIMEOUT', 30))
+
+    _lock = threading.Lock()
+    _pid = None
+    _loop = None
+    _session = None
+    _semaphore = None
+    _credentials = None
+
     def __init__(self):
         """
-        Initializes the AsyncRequest Class which prepares async requests
+        Initializes the AsyncRequest Class which prepares async requests. The
+        requests run on a long-lived event loop in a background thread with a
+        pooled session, so the calls are a sync facade for the Flask code.
 
         Attributes:
             credentials (obj): the credentials object from Google which gives the access_token for requests
-            nlp_headers (obj): the headers for the NLP libraries
-
         """
-        SCOPES = ['https://www.googleapis.com/auth/cloud-language']
+        self.credentials = AsyncRequest.get_credentials()
 
-        self.credentials = service_account.Credentials.from_service_account_file(os.environ['GOOGLE_APPLICATION_CREDENTIALS'], scopes=SCOPES)
-        self.credentials.refresh(requests.Request())
+    @staticmethod
+    def get_credentials():
+        """
+        Gets the shared credentials and creates them the first time they are used
+        """
+        with AsyncRequest._lock:
+            if AsyncRequest._credentials is None:
+                SCOPES = ['https://www.googleapis.com/auth/cloud-language']
+                AsyncRequest._credentials = service_account.Credentials.from_service_account_file(os.environ['GOOGLE_APPLICATION_CREDENTIALS'], scopes=SCOPES)
+            return AsyncRequest._credentials
+
+    @property
+    def nlp_headers(self):
+        """
+        The headers for the NLP libraries. The access token is refreshed
+        when it expired or is about to expire.
+        """
+        with AsyncRequest._lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(requests.Request())
+            token = self.credentials.token
 
-        self.nlp_headers = {
+        return {
             "content-type": "application/json",
-            "Authorization": "Bearer " + self.credentials.token
+            "Authorization": "Bearer " + token
         }
 
-    async def post_req(self, session,url, payload, headers):
+    @staticmethod
+    def get_loop():
         """
-        Performs asynchronous post request
+        Gets the event loop of the current process and starts it in a
+        background thread with its session the first time it is used. The
+        loop is recreated after a fork since its thread does not survive it.
+        """
+        with AsyncRequest._lock:
+            if AsyncRequest._loop is None or AsyncRequest._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='async-request-loop', daemon=True).start()
+                asyncio.run_coroutine_threadsafe(AsyncRequest.create_session(), loop).result()
+                AsyncRequest._loop = loop
+                AsyncRequest._pid = os.getpid()
+            return AsyncRequest._loop
+
+    @staticmethod
+    async def create_session():
+        """
+        Creates the pooled session and the concurrency limit on the event loop.
+        Connections are kept alive and DNS lookups are cached between requests.
+        """
+        connector = aiohttp.TCPConnector(
+            limit=AsyncRequest.max_concurrency,
+            ttl_dns_cache=300,
+            resolver=aiohttp.AsyncResolver())
+        AsyncRequest._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=AsyncRequest.timeout))
+        AsyncRequest._semaphore = asyncio.Semaphore(AsyncRequest.max_concurrency)
+
+    async def post_req(self, session, url, payload, headers):
+        """
+        Performs asynchronous post request, at most `max_concurrency` requests are in flight
 
         Returns:
             json_resp: the json response of the post request
         """
-        async with session.post(url, json=payload, headers=headers) as resp:
-            json_resp = await resp.json()
-            return json_resp
+        async with AsyncRequest._semaphore:
+            async with session.post(url, json=payload, headers=headers) as resp:
+                json_resp = await resp.json()
+                return json_resp
 
-    async def nlp_req(self, url, text_list):
+    async def nlp_req(self, url, text_list, headers):
         """
-        Starts an asynchronous session and makes a post request based on the list of text to
-        the NLP libraries
+        Makes a post request for each text in the list to the NLP libraries
+        with the shared session
 
         Args:
             url (str): url to make the NLP request to
             text_list (list): list of strings to be analyzed
+            headers (dict): the headers of the requests
 
         Returns:
             nlp_list (list): a list of the responses from the NLP libraries
 
         """
-        async with aiohttp.ClientSession() as session:
-            req_list = []
-            for sentence in text_list:
-                req_list.append(self.post_req(session, 
-                    url, 
-                    {
-                      "encodingType": "UTF8",
-                      "document": {
-                        "type": "PLAIN_TEXT",
-                        "content": sentence
-                      }
-                    }, 
-                    self.nlp_headers))
-            nlp_list = await asyncio.gather(*req_list)
+        req_list = []
+        for sentence in text_list:
+            req_list.append(self.post_req(AsyncRequest._session,
+                url,
+                {
+                  "encodingType": "UTF8",
+                  "document": {
+                    "type": "PLAIN_TEXT",
+                    "content": sentence
+                  }
+                },
+                headers))
+        nlp_list = await asyncio.gather(*req_list)
         return nlp_list
 
+    def run(self, url, text_list):
+        """
+        Runs the NLP requests on the background event loop and waits for the responses
+        """
+        loop = AsyncRequest.get_loop()
+        future = asyncio.run_coroutine_threadsafe(self.nlp_req(url, text_list, self.nlp_headers), loop)
+        return future.result()
+
     def analyze_syntax(self, text_list):
         """
         Analyzes the syntax of text_list making asynchronous requests to nlp lib
@@ -73,11 +144,7 @@ class AsyncRequest:
             syntax_list (list): list of the syntax responses from lib
         """
         url = 'https://language.googleapis.com/v1/documents:analyzeSyntax'
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        syntax_list = loop.run_until_complete(self.nlp_req(url, text_list))
-        loop.close()
-        return syntax_list
+        return self.run(url, text_list)
 
     def analyze_entities(self, text_list):
         """
@@ -87,8 +154,4 @@ class AsyncRequest:
             entites_list (list): list of entity responses from lib
         """
         url = 'https://language.googleapis.com/v1/documents:analyzeEntities'
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        entities_list = loop.run_until_complete(self.nlp_req(url, text_list))
-        loop.close()
-        return entities_list
+        return self.run(url, text_list)
@@ -0,0 +1,198 @@
+from collections import OrderedDict
+
+import threading
+import sqlite3
+import time
+import os
+
+
+class LRUCache:
+    def __init__(self, max_items=1024, ttl=None):
+        """
+        In-process least recently used cache
+
+        Args:
+            max_items (int): maximum number of items before the least recently used item is evicted
+            ttl (float): seconds an item stays valid for, None to never expire
+        """
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, expires = item
+            if expires is not None and expires < time.time():
+                del self._items[key]
+                self.misses += 1
+                return default
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._items[key] = (value, expires)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'items': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'evictions': self.evictions
+            }
+
+
+class DiskCache:
+    def __init__(self, path, max_bytes=256*1024*1024):
+        """
+        On-disk cache stored in SQLite that evicts the least recently used
+        items once the stored values are larger than `max_bytes`. The file can
+        be shared by all the gunicorn workers of an instance.
+
+        Args:
+            path (str): path to the SQLite file
+            max_bytes (int): maximum size of the stored values
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+    def get_connection(self):
+        """
+        Gets the connection of the current process, connections are not
+        shared across forks
+        """
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+            self._conn.commit()
+            self.bytes = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                conn = self.get_connection()
+                row = conn.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return default
+                conn.execute('UPDATE cache SET accessed = ? WHERE key = ?', (time.time(), key))
+                conn.commit()
+            except sqlite3.Error as e:
+                print('Disk cache error: %s' % e)
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        """
+        Args:
+            value (str|bytes): the value to store
+        """
+        size = len(value)
+        with self._lock:
+            try:
+                conn = self.get_connection()
+                conn.execute('INSERT OR REPLACE INTO cache (key, value, size, accessed) VALUES (?, ?, ?, ?)', (key, value, size, time.time()))
+                conn.commit()
+                self.bytes += size
+                if self.bytes > self.max_bytes:
+                    self.evict(conn)
+            except sqlite3.Error as e:
+                print('Disk cache error: %s' % e)
+
+    def evict(self, conn):
+        """
+        Deletes the least recently used items until the cache is under 90% of `max_bytes`
+        """
+        # other workers write to the same file so the size is recounted first
+        self.bytes = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+        target_bytes = self.max_bytes * 0.9
+        rows = conn.execute('SELECT key, size FROM cache ORDER BY accessed').fetchall()
+
+        evict_keys = []
+        for key, size in rows:
+            if self.bytes <= target_bytes:
+                break
+            evict_keys.append((key,))
+            self.bytes -= size
+
+        conn.executemany('DELETE FROM cache WHERE key = ?', evict_keys)
+        conn.commit()
+        self.evictions += len(evict_keys)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'evictions': self.evictions
+            }
+
+
+class TieredCache:
+    def __init__(self, memory, disk=None):
+        """
+        Cache that checks the in-process tier before the on-disk tier and
+        promotes values found on disk to memory
+
+        Args:
+            memory (LRUCache): the in-process tier
+            disk (DiskCache): the on-disk tier, None to only cache in memory
+        """
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return default if value is None else value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def get_stats(self):
+        return {
+            'memory': self.memory.get_stats(),
+            'disk': self.disk.get_stats() if self.disk is not None else None
+        }
@@ -3,6 +3,7 @@ from anytree.exporter import DotExporter
 from anytree.search import find
 from lib.Sentence import Sentence
 from lib.Question import Question
+from lib.TokenTable import TokenTable
 from lib.Quizlet import Quizlet
 import re
 import requests
@@ -28,7 +29,6 @@ class Document:
         TODO:
             * Rotate image so that the text can be aligned before sending it to the vision api
             * Deal with differen columns on the same page
-            * Deal with multiple pages and combining pages together
         """
         self.root_node = Node('root')
         self.annotation_list = []
@@ -77,6 +77,29 @@ class Document:
                     self.annotation_list.append({ 'sentences': sentences, 'paragraph': paragraph, 'text': paragraph['text'] })
                 break
 
+    @staticmethod
+    def merge(documents, WORD_EMBEDDINGS):
+        """
+        Merges the documents of several pages into one document so that the
+        questions are generated from all the pages together
+
+        Args:
+            documents ([Document]): the documents of each page in page order
+
+        Returns:
+            document (Document): document with the trees of all the pages under its root node
+        """
+        symbol_width = sum([document.symbol_width for document in documents]) / max(len(documents), 1)
+        symbol_height = sum([document.symbol_height for document in documents]) / max(len(documents), 1)
+        merged_document = Document([], symbol_width, symbol_height, WORD_EMBEDDINGS)
+
+        for document in documents:
+            for child_node in document.root_node.children:
+                child_node.parent = merged_document.root_node
+            merged_document.annotation_list.extend(document.annotation_list)
+
+        return merged_document
+
     @staticmethod
     def find_top_left(paragraph_list, prev_top_left_x_val):
         """
@@ -267,17 +290,20 @@ class Document:
             questions ([Question]): list of question objects
             question_starters (list): list of strings that are used to preface the question
         """
+        # the words of all the sentences are filtered at once
+        token_table = TokenTable([sentence.words for sentence in sentence_list])
         try:
             sent_scores = text_summarize.get_sent_scores(self.WORD_EMBEDDINGS, [str(sentence) for sentence in sentence_list])
-            ranked_sentences = sorted(((sent_scores[i], s, question_starter_list[i]) for i,s in enumerate(sentence_list)), reverse=True, key=lambda x: x[0])
         except Exception as e:
             print(e)
-            max_salience_key = lambda x: max([word.salience for word in x[1].words])
-            ranked_sentences = sorted(((0, s, question_starter_list[i]) for i, s in enumerate(sentence_list)), reverse=True, key=max_salience_key)
+            sent_scores = token_table.get_max_salience()
+        ranked_idxs = sorted(range(len(sentence_list)), reverse=True, key=lambda i: sent_scores[i])
 
         # sorts sentences by score and takes the first few sentences and creates fib questions
         num_questions = int(len(sentence_list)*0.3)
-        questions = [ ( Question(sent[1]), sent[2] ) for sent in ranked_sentences[:num_questions] if Question.is_question(sent[1])]
+        question_mask = token_table.get_question_mask()
+        answer_idxs = token_table.get_answer_idxs()
+        questions = [ ( Question(sentence_list[i], answer_idxs[i]), question_starter_list[i] ) for i in ranked_idxs[:num_questions] if question_mask[i]]
         if not questions:
             return None, None
         questions, question_starters = zip(*questions)
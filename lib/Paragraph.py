@@ -3,14 +3,22 @@ from lib.Word import Word
 import re
 
 class ParagraphHelper:
-    def __init__(self, word_list=[], avg_symbol_width=0, avg_symbol_height=0, doc=None):
+    def __init__(self, word_list=[], avg_symbol_width=0, avg_symbol_height=0, doc=None, text_layer=None, analyze=True):
         """
         Class that helps produce paragraph lists in the format of (text, bounding box)
 
+        Args:
+            doc (obj): document object from Google Vision API
+            text_layer (list): blocks of (text, (x_min, y_min, x_max, y_max)) words from the text layer of a pdf
+            analyze (bool): flag to run the NLP requests right away. When False,
+                `analyze_text()` has to be called before getting the paragraph list
+
         Attributes:
             word_list (list): list of words
             avg_symbol_width (float): avg pixel width of symbol
             avg_symbol_height (float): avg pixel height of symbol 
+            segment_sizes (list): number of words in each paragraph detected by the OCR,
+                used as the unit of the NLP cache
 
         For Bounding Box (indices):
             0 -  top left
@@ -18,21 +26,37 @@ class ParagraphHelper:
             2 - bottom right
             3 - bottom left
         """
-        if not doc:
+        if doc:
+            # helper function which is an alternate way to initalize the ParagraphHelper Class
+            self.seperate_to_words(doc)
+        elif text_layer:
+            self.seperate_text_layer(text_layer)
+        else:
             self.word_list = word_list
             self.avg_symbol_height = avg_symbol_width
             self.avg_symbol_width = avg_symbol_height
-        else:
-            # helper function which is an alternate way to initalize the ParagraphHelper Class
-            self.seperate_to_words(doc)
+            self.segment_sizes = [len(word_list)]
+
+        if analyze and hasattr(self, 'word_list'):
+            self.analyze_text()
 
-        if hasattr(self, 'word_list'):
-            # Performing NLP here
-            text = ' '.join([word['text'].replace(' ', '') for word in self.word_list])
-            self.syntax_list = Word.analyze_text_syntax(text)
-            self.entity_list = Word.analyze_text_entities(text)
-            assert(len(self.word_list) == len(self.syntax_list))
-            assert(len(self.word_list) == len(self.entity_list))
+    def analyze_text(self):
+        """
+        Performs the NLP request on the text of the word list and stores
+        the syntax and entity lists. Each paragraph from the OCR is a segment
+        in the NLP cache so only new paragraphs are sent to the NLP lib.
+        """
+        word_text_list = [word['text'].replace(' ', '') for word in self.word_list]
+        segment_list = []
+        start = 0
+        for size in self.segment_sizes:
+            if size:
+                segment_list.append(' '.join(word_text_list[start:start+size]))
+            start += size
+
+        self.syntax_list, self.entity_list = Word.annotate_segments(segment_list)
+        assert(len(self.word_list) == len(self.syntax_list))
+        assert(len(self.word_list) == len(self.entity_list))
 
     @staticmethod
     def get_width_height(bounding_box):
@@ -209,12 +233,14 @@ class ParagraphHelper:
         """
         breaks = vision.enums.TextAnnotation.DetectedBreak.BreakType
         word_list = []
+        segment_sizes = []
         avg_symbol_width_list = []
         avg_symbol_height_list = []
 
         for page in doc.pages:
             for block in page.blocks:
                 for paragraph in block.paragraphs:
+                    segment_sizes.append(len(paragraph.words))
                     for word in paragraph.words:
                         word_text = ''.join([
                             symbol.text + ' ' if symbol.property.detected_break.type in [breaks.SPACE, breaks.EOL_SURE_SPACE] else symbol.text for symbol in word.symbols
@@ -237,6 +263,48 @@ class ParagraphHelper:
         self.avg_symbol_height = sum(avg_symbol_height_list) / len(avg_symbol_height_list)
 
         self.word_list = word_list
+        self.segment_sizes = segment_sizes
+
+    def seperate_text_layer(self, text_layer):
+        """
+        Creates the same list of words and average symbol size as
+        `seperate_to_words` from the text layer of a pdf so that it does
+        not have to go through the Google Vision API
+
+        Args:
+            text_layer (list): blocks of (text, (x_min, y_min, x_max, y_max)) words in reading order
+        """
+        word_list = []
+        segment_sizes = [len(block) for block in text_layer]
+        total_width = 0
+        total_height = 0
+        num_symbols = 0
+
+        for text, (x_min, y_min, x_max, y_max) in [word for block in text_layer for word in block]:
+            bounding_box = vision.types.BoundingPoly(vertices=[
+                vision.types.Vertex(x=int(x_min), y=int(y_min)),
+                vision.types.Vertex(x=int(x_max), y=int(y_min)),
+                vision.types.Vertex(x=int(x_max), y=int(y_max)),
+                vision.types.Vertex(x=int(x_min), y=int(y_max))
+            ])
+            word_list.append({
+                'text': text + ' ',
+                'bounding_box': bounding_box
+            })
+
+            # every symbol in the word has the same width and height
+            total_width += x_max - x_min
+            total_height += (y_max - y_min) * len(text)
+            num_symbols += len(text)
+
+        if num_symbols == 0:
+            return None
+
+        self.avg_symbol_width = total_width / num_symbols
+        self.avg_symbol_height = total_height / num_symbols
+
+        self.word_list = word_list
+        self.segment_sizes = segment_sizes
 
     def get_line_list(self):
         line_list = []
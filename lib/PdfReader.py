@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from lib.Vision import Vision
+from lib.Document import Document
+from lib.Paragraph import ParagraphHelper
+from lib.Word import NLP_CHUNK_WORKERS
+from lib.scripts import pdf
+
+import tempfile
+import io
+import os
+
+
+class PdfReader:
+    # number of pages that are rasterized and processed at the same time,
+    # 0 derives it from the pre-processing pool and the NLP workers
+    max_workers = int(os.environ.get('PDF_PAGE_WORKERS', 0))
+
+    def __init__(self, pdf_file, local=False, first_page=None, last_page=None, dpi=pdf.DPI, max_workers=None):
+        """
+        Initializes the PdfReader object which streams the pages of a pdf
+        through the Vision and NLP pipeline. Pages with a text layer skip
+        the rasterization and the Vision API entirely.
+
+        Args:
+            pdf_file (obj): the pdf file object read from the server or locally
+            local (bool): flag to determine if the file is read locally
+            first_page (int): first page to read (1-indexed), defaults to the first page
+            last_page (int): last page to read, defaults to the last page
+            dpi (int): resolution to rasterize the pages with
+            max_workers (int): number of pages processed concurrently, defaults to `get_default_workers`
+
+        Attributes:
+            paragraph_list (list): the paragraphs of all the pages in page order
+            vision (Vision): the Vision object of the first page read if it was OCR'd
+            page_count (int): the number of pages that produced paragraphs
+            text_layer_count (int): the number of pages read from the text layer
+        """
+        self.pdf_file = pdf_file
+        self.local = local
+        self.file_name, file_ext = os.path.splitext(pdf_file.filename) if not local else os.path.splitext(pdf_file.name)
+        self.file_ext = file_ext.replace('.', '')
+        self.first_page = first_page
+        self.last_page = last_page
+        self.dpi = dpi
+        self.max_workers = max_workers or PdfReader.max_workers or PdfReader.get_default_workers()
+
+        self.page_range = range(0)
+        self.paragraph_list = []
+        self.vision = None
+        self.page_count = 0
+        self.text_layer_count = 0
+
+    @staticmethod
+    def get_default_workers():
+        """
+        Gets the number of pages of a pdf processed at the same time. A page
+        holds a pre-processing process and the shared NLP chunk workers, so
+        more pages than either would only wait on them and one pdf would
+        fill the pre-processing queue of the other requests.
+
+        Returns:
+            max_workers (int): the number of pages processed concurrently
+        """
+        return max(1, min(Vision.preprocess_pool.max_workers, NLP_CHUNK_WORKERS))
+
+    def get_document(self, WORD_EMBEDDINGS):
+        """
+        Rasterizes the pages lazily and processes them with a bounded pool of
+        workers. At most `max_workers` pages are held in memory at a time.
+
+        Returns:
+            document (Document): the merged document of all the pages or None if no page had text
+        """
+        content = self.pdf_file.read()
+
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(content)
+            f.flush()
+            self.page_range = pdf.get_page_range(pdf.get_page_count(f.name), self.first_page, self.last_page)
+            pages = pdf.iter_pages(f.name, self.page_range, self.dpi)
+            results = self.process_pages(pages, WORD_EMBEDDINGS)
+
+        results = [results[page_num] for page_num in sorted(results) if results[page_num]]
+        if not results:
+            return None
+
+        self.page_count = len(results)
+        self.text_layer_count = len([result for result in results if result['text_layer']])
+        self.vision = results[0]['vision']
+        for result in results:
+            self.paragraph_list.extend(result['paragraph_list'])
+
+        return Document.merge([result['document'] for result in results], WORD_EMBEDDINGS)
+
+    def process_pages(self, pages, WORD_EMBEDDINGS):
+        """
+        Processes the pages concurrently. The next page is only pulled from
+        the `pages` generator once a worker is free.
+
+        Args:
+            pages (generator): generator of (page_num, words, image) tuples
+
+        Returns:
+            results (dict): the result of `process_page` for each page number
+        """
+        results = {}
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for page_num, words, image in pages:
+                if len(in_flight) >= self.max_workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[in_flight.pop(future)] = future.result()
+                in_flight[executor.submit(self.process_page, page_num, words, image, WORD_EMBEDDINGS)] = page_num
+                del words, image
+
+            for future in wait(in_flight).done:
+                results[in_flight.pop(future)] = future.result()
+
+        return results
+
+    def process_page(self, page_num, words, image, WORD_EMBEDDINGS):
+        """
+        Performs OCR (unless the text layer is given) and NLP on one page and
+        creates the document tree of the page
+
+        Args:
+            words (list): the blocks of words of the text layer of the page or None
+            image (ndarray): the BGR image of the page if it has no text layer
+
+        Returns:
+            result (dict): { 'vision':.., 'paragraph_list':.., 'document':.., 'text_layer':.. } or None if the page has no text
+        """
+        if words:
+            vis = None
+            p = ParagraphHelper(text_layer=words)
+        else:
+            vis = Vision(self.pdf_file, self.local, image=image)
+            p = vis.paragraph_helper if hasattr(vis, 'word_list') else None
+
+        if not p or not hasattr(p, 'word_list'):
+            print('page %s of %s.%s has no text' % (page_num, self.file_name, self.file_ext))
+            return None
+
+        paragraph_list = p.get_paragraph_list()
+        d = Document(paragraph_list, p.avg_symbol_width, p.avg_symbol_height, WORD_EMBEDDINGS)
+
+        # only the first page keeps its images for logging
+        if page_num != self.page_range[0]:
+            vis = None
+
+        return { 'vision': vis, 'paragraph_list': paragraph_list, 'document': d, 'text_layer': bool(words) }
+
+
+if __name__ == "__main__":
+    path = "/Users/matt/Documents/quiz-app/photos of text/test.pdf"
+    with io.open(path, 'rb') as pdf_file:
+        reader = PdfReader(pdf_file, True)
+        d = reader.get_document(None)
+    if not d:
+        print('Bad PDF Data')
+    else:
+        d.print()
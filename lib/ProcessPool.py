@@ -0,0 +1,144 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import threading
+import time
+import os
+
+
+class ProcessPoolError(Exception):
+    """
+    Raised when a task could not be run in the pool because the queue is
+    full, the task timed out or a worker died
+    """
+    pass
+
+
+def _run_task(fn, args):
+    """
+    Runs the task in the worker process. OpenCV is limited to one thread
+    since every worker already uses its own core.
+    """
+    import cv2
+    cv2.setNumThreads(1)
+    return fn(*args)
+
+
+class ProcessPool:
+    def __init__(self, max_workers=None, max_queue=None, timeout=None):
+        """
+        Bounded process pool that CPU bound work is offloaded to so that it
+        does not block the request threads. The pool is created lazily in each
+        gunicorn worker process so it is safe to create before forking.
+
+        Args:
+            max_workers (int): number of processes, 0 runs the tasks inline.
+                Defaults to the PREPROCESS_WORKERS env variable or the number of cores
+            max_queue (int): number of tasks that can wait for a free process.
+                Defaults to the PREPROCESS_QUEUE_DEPTH env variable or 2 * max_workers
+            timeout (float): seconds a request waits for a slot in the queue and
+                the result of its task. Defaults to the PREPROCESS_TIMEOUT env variable or 30 seconds
+        """
+        if max_workers is None:
+            max_workers = int(os.environ.get('PREPROCESS_WORKERS', os.cpu_count() or 1))
+        if max_queue is None:
+            max_queue = int(os.environ.get('PREPROCESS_QUEUE_DEPTH', 2 * max_workers))
+        if timeout is None:
+            timeout = float(os.environ.get('PREPROCESS_TIMEOUT', 30))
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._stats = {'completed': 0, 'queue_full': 0, 'timed_out': 0, 'broken': 0}
+
+    def get_executor(self):
+        """
+        Gets the executor of the current process and creates it if the
+        process was forked since it was last used
+        """
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def warmup(self):
+        """
+        Starts the worker processes so they are forked before the request
+        threads and gRPC channels of the gunicorn worker exist
+        """
+        if self.max_workers:
+            self.get_executor().submit(int).result()
+
+    def reset(self):
+        """
+        Shuts down the executor so that a new one is created on the next task
+        """
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def run(self, fn, *args):
+        """
+        Runs `fn(*args)` in the pool and waits for the result
+
+        Args:
+            fn (function): module level function so it can be pickled
+
+        Returns:
+            result: the return value of `fn`
+
+        Raises:
+            ProcessPoolError: if the queue is full, the task times out or the pool broke
+        """
+        if self.max_workers == 0:
+            return fn(*args)
+
+        # a full queue is waited on for the same timeout as the task, the
+        # pages of a pdf and the request threads burst above the queue depth
+        deadline = time.monotonic() + self.timeout
+        # the slot is held until the task finishes, even if the request stops waiting
+        if not self._slots.acquire(timeout=self.timeout):
+            self.count('queue_full')
+            raise ProcessPoolError('queue was full (%s tasks) for %s seconds' % (self.max_workers + self.max_queue, self.timeout))
+
+        try:
+            future = self.get_executor().submit(_run_task, fn, args)
+        except BrokenProcessPool as e:
+            self._slots.release()
+            self.reset()
+            self.count('broken')
+            raise ProcessPoolError('process pool is broken: %s' % e)
+        future.add_done_callback(lambda f: self._slots.release())
+
+        try:
+            result = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            self.count('timed_out')
+            raise ProcessPoolError('task timed out after %s seconds' % self.timeout)
+        except BrokenProcessPool as e:
+            self.reset()
+            self.count('broken')
+            raise ProcessPoolError('process pool is broken: %s' % e)
+        self.count('completed')
+        return result
+
+    def count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def get_stats(self):
+        """
+        Returns:
+            stats (dict): the number of tasks of this process that completed and
+                that fell back because the queue was full, they timed out or the pool broke
+        """
+        with self._lock:
+            return dict(self._stats, max_workers=self.max_workers, max_queue=self.max_queue)
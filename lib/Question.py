@@ -1,5 +1,5 @@
 from lib.Sentence import Sentence
-from lib.Word import Word
+from lib.TokenTable import TokenTable
 from bs4 import BeautifulSoup
 import requests
 
@@ -7,36 +7,34 @@ import requests
 class Question:
     __key_words = ('is', 'was', 'because', 'in', 'during', 'between')
 
-    def __init__(self, sentence):
+    def __init__(self, sentence, answer_idx=None):
         """
         Initializes the questions object
 
         Args:
             sentence (obj): Sentence object
+            answer_idx (int): index of the answer in the words of the sentence if it is already known
             answer (str): the answer of the fill in the blank from the question
         """
         self.sentence = sentence
-        self.answer = self.generate_blank()
+        self.answer = self.generate_blank(answer_idx)
 
-    def generate_blank(self):
+    def generate_blank(self, answer_idx=None):
         """
-        Generates a blank in the question based on the entity and returns
-        a string representing the answer
+        Generates a blank in the question based on the entity with the
+        highest salience and returns a string representing the answer
         """
-        # sorts the words by highest salience first
-        words = sorted(self.sentence.words, key=lambda x: x.salience, reverse=True)
-        # keep only the words that are entities
-        words = [word for word in words if word.entity and len(str(word)) > 1]
+        if answer_idx is None:
+            answer_idx = TokenTable([self.sentence.words]).get_answer_idxs()[0]
 
-        answer = words[0] if words else None
-
-        if not answer:
+        if answer_idx < 0:
             return None
+        answer = self.sentence.words[answer_idx]
 
-        # replace the word being used as answer with a blank
+        # blank out the word being used as answer
         for i, word in enumerate(self.sentence.words):
             if word == answer:
-                self.sentence.words[i] = Word()
+                self.sentence.blanks.add(i)
         return answer
 
     def export(self):
@@ -47,21 +45,7 @@ class Question:
         """
         Checks if the sentence is a question
         """
-        # gets list of all entities in the sentence
-        entities = [word for word in sentence.words if word.entity]
-        pos_list = [word.part_of_speech for word in sentence.words]
-        max_salience = max([word.salience for word in sentence.words])
-
-        words = sorted(sentence.words, key=lambda x: x.salience, reverse=True)
-        word_answers = [word for word in words if word.entity and len(str(word)) > 1]
-
-
-        # gets all the words in the sentence as a list of strings
-        words = sentence.return_string().split()
-        if len(entities) == 0 or len(sentence.words) <= 1 or ('VERB' in pos_list) or not word_answers:
-            return False
-
-        return True
+        return bool(TokenTable([sentence.words]).get_question_mask()[0])
 
     @staticmethod
     def get_wiki_questions(sentence):
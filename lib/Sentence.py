@@ -1,50 +1,53 @@
-from lib.Word import Word
+from lib.Word import Word, EntityWord
 from lib.AsyncRequest import AsyncRequest
-from nltk.tokenize import sent_tokenize
-from copy import deepcopy
+import nltk
 import re
 
 
 class Sentence:
     __subject_carry_over = ['this', 'it', 'he', 'she', 'his', 'her']
+    __sentence_tokenizer = None
 
-    def __init__(self, entity_list, syntax_list):
+    def __init__(self, entity_list, syntax_list, start=0, end=None):
         """
-        Initializes the sentence Object
+        Initializes the sentence Object as a view over the entity and syntax
+        lists of the paragraph. The words of the lists are shared and never
+        modified, entities are overlaid with `EntityWord` and blanks are
+        stored as word indices.
 
         Args:
-            entiity_obj (obj): a json response object returned from NLP lib for the syntax of the sentence
-            syntax_obj (obj): a json response object returned from NLP lib for the entity of the sentence
-            sent (string): the string value of the text
+            entity_list (list): the entity dict or None for each word of the paragraph
+            syntax_list (list): the [Word] for each word of the paragraph
+            start (int): index of the first word of the sentence in the lists
+            end (int): index after the last word of the sentence, defaults to the end of the lists
+
+        Attributes:
+            words (list): the words of the sentence with the words of an entity grouped together
+            blanks (set): indices of the words in `words` that are blanked out
 
         TODO:
             * What happens when NLP detects an entity across paragraphs??????
         """
+        end = len(syntax_list) if end is None else end
         self.words = []
+        self.blanks = set()
         self.subject = None
-        del_idxs = []
-        words_i = 0
-        syntax_list = deepcopy(syntax_list)
-        entity_list = deepcopy(entity_list)
         entity_cnt_list = []
-        for i, (syntax, entity) in enumerate(zip(syntax_list, entity_list)):
+        for i in range(start, end):
+            entity = entity_list[i]
             # one syntax can have more than one word
-            for word in syntax:
-                if entity:
-                    entity_cnt_list.append(str(word))  
-                    # deletes if not last entity OR current entity == next entity 
-                    if i != len(entity_list) - 1 and entity == entity_list[i+1]:
-                        del_idxs.append(words_i)
-                    else:
-                        entity_content = ' '.join(entity_cnt_list)
-                        word.add_entity(entity['type'], entity['salience'], entity_content, entity['wiki'])
-                        entity_cnt_list = []
-                words_i += 1
-                self.words.append(word)
-
-        # group words together and delete extra words if they are of the same entity
-        for del_idx in sorted(del_idxs, reverse=True):
-            del self.words[del_idx]
+            for word in syntax_list[i]:
+                if not entity:
+                    self.words.append(word)
+                    continue
+
+                entity_cnt_list.append(str(word))
+                # skips the word if the next word is part of the same entity
+                if i != end - 1 and entity == entity_list[i+1]:
+                    continue
+                entity_content = ' '.join(entity_cnt_list)
+                self.words.append(EntityWord(word, entity['type'], entity['salience'], entity_content, entity['wiki']))
+                entity_cnt_list = []
 
     def __str__(self):
         return self.return_string()
@@ -53,7 +56,7 @@ class Sentence:
         """
         :return: sentence in string format
         """
-        return ' '.join([word.content for word in self.words])
+        return ' '.join([Word.blank_content if i in self.blanks else word.content for i, word in enumerate(self.words)])
 
 
     @staticmethod
@@ -80,45 +83,50 @@ class Sentence:
         pos_list = [word.part_of_speech for word in self.words]
         return 'VERB' not in pos_list
 
+    @staticmethod
+    def get_sentence_tokenizer():
+        """
+        Gets the punkt tokenizer that `sent_tokenize` uses, it is only loaded once
+        """
+        if Sentence.__sentence_tokenizer is None:
+            Sentence.__sentence_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+        return Sentence.__sentence_tokenizer
+
     @staticmethod
     def get_sentences_from_paragraph(word_list, entity_list, syntax_list):
-        paragraph_text = ' '.join([word['text'].replace(' ', '') for word in word_list])
-        sent_text_list = sent_tokenize(paragraph_text)
-        sent_obj_list = []
-        count = 0
+        """
+        Splits the word, entity and syntax lists of a paragraph into sentences
+        in a single pass using the character spans of the punkt tokenizer
+
+        Returns:
+            sent_obj_list (list): the Sentence objects of the paragraph
+        """
+        text_list = [word['text'].replace(' ', '') for word in word_list]
+        paragraph_text = ' '.join(text_list)
 
         assert(len(word_list) == len(syntax_list))
 
-        #print(sent_text_list)
-        #print([entity['content'] if entity else None for entity in entity_list])
-        #print(' '.join([str(word[0]) for word in syntax_list]))
-        
-        
-        # Splits the word, entity and syntax list based on `sent_tokenize`
-        for sent_text in sent_text_list:
-            for i, char in enumerate(paragraph_text):
-                sentence = paragraph_text[count:i+1].lstrip()
-                if sent_text == sentence:
-                    split_list_idx = len([w for w in sentence.split(' ') if w != ''])
-                    sent_obj_list.append(Sentence(entity_list[:split_list_idx], syntax_list[:split_list_idx]))
-                    '''
-                    print(sent_text)
-                    print([entity['content'] if entity else None for entity in entity_list[:split_list_idx]])
-                    print(' '.join([''.join([str(word) for word in words]) for words in syntax_list[:split_list_idx]]))
-                    print(str(Sentence(entity_list[:split_list_idx], syntax_list[:split_list_idx])))
-                    print('')
-                    '''
-                    entity_list = entity_list[split_list_idx:]
-                    syntax_list = syntax_list[split_list_idx:]
-                    #print(paragraph_text[count:i+1])
-                    count = i+1
-                    #print(paragraph_text[count:])
-                    #print('')
-                    break
-
-        assert(len(sent_text_list) == len(sent_obj_list))
-        return sent_obj_list
+        # the char offset of the end of each word
+        word_ends = []
+        offset = 0
+        for text in text_list:
+            offset += len(text)
+            word_ends.append(offset)
+            offset += 1
 
+        sent_obj_list = []
+        start_idx = 0
+        end_idx = 0
+        for span_start, span_end in Sentence.get_sentence_tokenizer().span_tokenize(paragraph_text):
+            # the sentence ends with the word its last char is in
+            while end_idx < len(word_ends) and word_ends[end_idx] < span_end:
+                end_idx += 1
+            end_idx = min(end_idx + 1, len(word_ends))
+            if end_idx > start_idx:
+                sent_obj_list.append(Sentence(entity_list, syntax_list, start_idx, end_idx))
+            start_idx = end_idx
+
+        return sent_obj_list
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+from lib.Word import Word
+import numpy as np
+
+
+class TokenTable:
+    def __init__(self, sentence_word_list):
+        """
+        Stores the words of a list of sentences as columns so the filters over
+        every word of a document run as array operations
+
+        Args:
+            sentence_word_list (list): the list of words of each sentence
+
+        Attributes:
+            offsets (ndarray): index of the first word of each sentence, with the number of words at the end
+            pos (ndarray): the part of speech tag id of each word, -1 if unknown
+            entity_type (ndarray): the index of the entity type in `Word.entity_types`, -1 if not an entity
+            salience (ndarray): the salience of each word
+            content_id (ndarray): index of the content of each word in `strings`
+            strings (list): the interned contents of the words
+        """
+        num_words = sum([len(words) for words in sentence_word_list])
+        self.offsets = np.zeros(len(sentence_word_list) + 1, dtype=np.int64)
+        self.pos = np.full(num_words, -1, dtype=np.int16)
+        self.entity_type = np.full(num_words, -1, dtype=np.int8)
+        self.salience = np.zeros(num_words, dtype=np.float64)
+        self.content_id = np.zeros(num_words, dtype=np.int32)
+        # part_of_speech is the tag id from the NLP lib, so only words that
+        # carry the 'VERB' label itself are treated as verbs
+        self.is_verb_label = np.zeros(num_words, dtype=bool)
+
+        string_ids = {}
+        i = 0
+        for sent_idx, words in enumerate(sentence_word_list):
+            self.offsets[sent_idx] = i
+            for word in words:
+                if isinstance(word.part_of_speech, int):
+                    self.pos[i] = word.part_of_speech
+                self.is_verb_label[i] = word.part_of_speech == 'VERB'
+                if word.entity:
+                    self.entity_type[i] = Word.entity_type_ids.get(word.entity, 0)
+                self.salience[i] = word.salience
+                self.content_id[i] = string_ids.setdefault(word.content, len(string_ids))
+                i += 1
+        self.offsets[-1] = i
+
+        self.strings = list(string_ids)
+        content_len = np.array([len(string) for string in self.strings], dtype=np.int32)
+        self.content_len = content_len[self.content_id] if num_words else np.zeros(0, dtype=np.int32)
+
+    def get_sentence_ids(self):
+        """
+        Returns:
+            sentence_ids (ndarray): the index of the sentence of each word
+        """
+        return np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+
+    def reduce_max(self, values, empty):
+        """
+        Gets the max of `values` in each sentence, `empty` for sentences without words
+        """
+        result = np.full(len(self.offsets) - 1, empty, dtype=values.dtype)
+        has_words = np.diff(self.offsets) > 0
+        if has_words.any():
+            result[has_words] = np.maximum.reduceat(values, self.offsets[:-1][has_words])
+        return result
+
+    def get_answer_mask(self):
+        """
+        Returns:
+            answer_mask (ndarray): True for the words that can be the answer of a question
+        """
+        return (self.entity_type >= 0) & (self.content_len > 1)
+
+    def get_max_salience(self):
+        """
+        Returns:
+            max_salience (ndarray): the highest salience of the words of each sentence
+        """
+        return self.reduce_max(self.salience, 0)
+
+    def get_answer_idxs(self):
+        """
+        Gets the answer of each sentence, which is the entity with the
+        highest salience and the first of them if there is a tie
+
+        Returns:
+            answer_idxs (ndarray): index of the answer in the words of each sentence, -1 if there is none
+        """
+        answer_idxs = np.full(len(self.offsets) - 1, -1, dtype=np.int64)
+        answer_mask = self.get_answer_mask()
+        candidates = np.flatnonzero(answer_mask)
+        if not len(candidates):
+            return answer_idxs
+
+        sentence_ids = self.get_sentence_ids()[candidates]
+        # sorted by sentence then by salience, the sort is stable so ties keep the word order
+        order = np.lexsort((-self.salience[candidates], sentence_ids))
+        candidates = candidates[order]
+        sentence_ids = sentence_ids[order]
+        is_first = np.ones(len(candidates), dtype=bool)
+        is_first[1:] = sentence_ids[1:] != sentence_ids[:-1]
+
+        answer_idxs[sentence_ids[is_first]] = candidates[is_first] - self.offsets[sentence_ids[is_first]]
+        return answer_idxs
+
+    def get_question_mask(self):
+        """
+        Checks which sentences can be made into a question
+
+        Returns:
+            question_mask (ndarray): True for the sentences that can be a question
+        """
+        num_words = np.diff(self.offsets)
+        has_entity = self.reduce_max(self.entity_type >= 0, False)
+        has_answer = self.reduce_max(self.get_answer_mask(), False)
+        has_verb = self.reduce_max(self.is_verb_label, False)
+        return has_entity & (num_words > 1) & ~has_verb & has_answer
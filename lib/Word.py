@@ -1,8 +1,43 @@
-from google.cloud import language
 from google.cloud.language import enums
 from google.cloud.language import types
+from lib.scripts import clients
+from lib.Cache import LRUCache, DiskCache, TieredCache
+from concurrent.futures import ThreadPoolExecutor
+import bisect
+import hashlib
+import json
+import os
+import threading
+import unicodedata
 import six
+
+# an empty path only keeps the NLP cache in memory
+NLP_CACHE_PATH = os.environ.get('NLP_CACHE_PATH', 'nlp_cache.sqlite')
+# max bytes of text in one NLP request, far below the API limit so long
+# documents are split into chunks that are annotated at the same time
+NLP_CHUNK_BYTES = int(os.environ.get('NLP_CHUNK_BYTES', 20000))
+NLP_CHUNK_WORKERS = int(os.environ.get('NLP_CHUNK_WORKERS', 4))
+
 class Word:
+    # words are created for every token so they do not carry a __dict__
+    __slots__ = ('content', 'part_of_speech', 'entity', 'salience', 'wiki')
+
+    # content of a blanked out word
+    blank_content = '____'
+    pos_tags = ('UNKNOWN', 'ADJ', 'ADP', 'ADV', 'CONJ', 'DET', 'NOUN', 'NUM', 'PRON', 'PRT', 'PUNCT', 'VERB', 'X', 'AFFIX')
+    entity_types = ('UNKNOWN', 'PERSON', 'LOCATION', 'ORGANIZATION',
+                    'EVENT', 'WORK_OF_ART', 'CONSUMER_GOOD', 'OTHER', 'PHONE_NUMBER', 'ADDRESS', 'DATE', 'NUMBER', 'PRICE')
+    entity_type_ids = { entity_type: i for i, entity_type in enumerate(entity_types) }
+    # changing the request or the alignment of the NLP results invalidates the cache
+    nlp_cache_version = 'language-v1:annotateText:syntax,entities:UTF8:5'
+    nlp_cache = TieredCache(
+        LRUCache(max_items=int(os.environ.get('NLP_CACHE_ITEMS', 2048))),
+        DiskCache(NLP_CACHE_PATH, max_bytes=int(os.environ.get('NLP_CACHE_BYTES', 256*1024*1024))) if NLP_CACHE_PATH else None
+    )
+    _chunk_lock = threading.Lock()
+    _chunk_executor = None
+    _chunk_pid = None
+
     def __init__(self, token=None, text=None):
         """
         Initializes word object based on token or text
@@ -15,12 +50,10 @@ class Word:
             self.content = text
             self.part_of_speech = 'UNKNOWN'
         elif token:
-            pos_tag = (
-            'UNKNOWN', 'ADJ', 'ADP', 'ADV', 'CONJ', 'DET', 'NOUN', 'NUM', 'PRON', 'PRT', 'PUNCT', 'VERB', 'X', 'AFFIX')
             self.content = token.text.content
             self.part_of_speech = token.part_of_speech.tag
         else:
-            self.content = "____"
+            self.content = Word.blank_content
             self.part_of_speech = None
         self.entity = None
         self.salience = 0
@@ -33,23 +66,234 @@ class Word:
         Args:
             entity (obj): entity object from NLP lib
         """
-        entity_type = ('UNKNOWN', 'PERSON', 'LOCATION', 'ORGANIZATION',
-                       'EVENT', 'WORK_OF_ART', 'CONSUMER_GOOD', 'OTHER', 'PHONE_NUMBER', 'ADDRESS', 'DATE', 'NUMBER', 'PRICE')
-
-        self.entity = entity_type[entity] if entity < len(entity_type) else entity_type[0]
+        self.entity = Word.entity_types[entity] if entity < len(Word.entity_types) else Word.entity_types[0]
         self.salience = salience
         self.content = content
         self.wiki = wiki
 
+    def to_list(self):
+        """
+        Serializes the syntax of the word for the NLP cache
+        """
+        return [self.content, self.part_of_speech]
+
+    @staticmethod
+    def from_list(values):
+        """
+        Creates the word from the values returned by `to_list`
+        """
+        word = Word()
+        word.content, word.part_of_speech = values
+        return word
+
     def print_word(self):
         print({"content": self.content, "part_of_speech": self.part_of_speech, "entity": self.entity,
                "salience": self.salience})
 
+    @staticmethod
+    def get_cache_key(text):
+        """
+        Gets the NLP cache key of the normalized text
+        """
+        normalized = unicodedata.normalize('NFC', text).strip()
+        return hashlib.sha1((Word.nlp_cache_version + '\n' + normalized).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def annotate_segments(segment_list):
+        """
+        Gets the syntax and the entities of the text split into segments
+        (e.g. paragraphs). Segments are looked up in the NLP cache and only
+        the cache misses are sent to the NLP lib in chunks of at most
+        `NLP_CHUNK_BYTES` that are annotated concurrently, then all the
+        results are stitched back together in order.
+
+        The results are cached per segment, but the salience of an entity
+        depends on the rest of the text of its request. The cached salience
+        of a segment is the one of the batch of misses it was annotated
+        with, which is accepted to keep a page to one request per chunk.
+
+        Args:
+            segment_list (list): the text of each segment with the words seperated by spaces
+
+        Returns:
+            syntax_list (list): a list of [Word] for each word in all the segments
+            entity_list (list): a list of the entity dict or None for each word in all the segments
+        """
+        key_list = [Word.get_cache_key(segment) for segment in segment_list]
+        result_list = []
+        for key in key_list:
+            cached = Word.nlp_cache.get(key)
+            result_list.append(Word.load_nlp_result(cached) if cached else None)
+
+        miss_idxs = [i for i, result in enumerate(result_list) if result is None]
+        if miss_idxs:
+            chunk_list = Word.get_chunk_list([(i, segment_list[i]) for i in miss_idxs], NLP_CHUNK_BYTES)
+            if len(chunk_list) == 1:
+                chunk_result_list = [Word.annotate_chunk(chunk_list[0])]
+            else:
+                chunk_result_list = list(Word.get_chunk_executor().map(Word.annotate_chunk, chunk_list))
+
+            # a segment split across chunks is stitched back from its pieces
+            for i in miss_idxs:
+                result_list[i] = ([], [])
+            for chunk_result in chunk_result_list:
+                for i, syntax_list, entity_list in chunk_result:
+                    result_list[i][0].extend(syntax_list)
+                    result_list[i][1].extend(entity_list)
+            for i in miss_idxs:
+                Word.nlp_cache.set(key_list[i], Word.dump_nlp_result(*result_list[i]))
+
+        syntax_list = [words for segment_syntax, segment_entity in result_list for words in segment_syntax]
+        entity_list = [entity for segment_syntax, segment_entity in result_list for entity in segment_entity]
+        return syntax_list, entity_list
+
+    @staticmethod
+    def get_chunk_executor():
+        """
+        Gets the thread pool of the current process that the chunks are annotated in
+        """
+        with Word._chunk_lock:
+            if Word._chunk_executor is None or Word._chunk_pid != os.getpid():
+                Word._chunk_executor = ThreadPoolExecutor(max_workers=NLP_CHUNK_WORKERS)
+                Word._chunk_pid = os.getpid()
+            return Word._chunk_executor
+
+    @staticmethod
+    def split_segment(segment, max_bytes):
+        """
+        Splits a segment that is larger than `max_bytes` into pieces. Pieces
+        end at the last sentence that fits, or at a word if a sentence does
+        not fit. The words after the cut are carried over to the next piece.
+
+        Returns:
+            piece_list (list): the text of each piece with the words seperated by spaces
+        """
+        if len(segment.encode('utf-8')) <= max_bytes:
+            return [segment]
+
+        piece_list = []
+        piece = []
+        piece_bytes = 0
+        sentence_end = 0
+        for word in segment.split(' '):
+            word_bytes = len(word.encode('utf-8')) + 1
+            # the bytes count a space after every word, the space after the last word is not sent.
+            # the carried words can still be too large with the word, then they are cut again
+            while piece and piece_bytes + word_bytes - 1 > max_bytes:
+                cut = sentence_end or len(piece)
+                piece_list.append(' '.join(piece[:cut]))
+                piece = piece[cut:]
+                piece_bytes = sum([len(w.encode('utf-8')) + 1 for w in piece])
+                sentence_end = max([j + 1 for j, w in enumerate(piece) if w.endswith(('.', '!', '?'))] or [0])
+            piece.append(word)
+            piece_bytes += word_bytes
+            if word.endswith(('.', '!', '?')):
+                sentence_end = len(piece)
+
+        if piece:
+            piece_list.append(' '.join(piece))
+        return piece_list
+
+    @staticmethod
+    def get_chunk_list(segment_list, max_bytes):
+        """
+        Packs the segments in order into chunks of at most `max_bytes`
+
+        Args:
+            segment_list (list): list of (segment index, segment text)
+
+        Returns:
+            chunk_list (list): list of chunks which are lists of (segment index, piece text)
+        """
+        chunk_list = []
+        chunk = []
+        chunk_bytes = 0
+        for i, segment in segment_list:
+            for piece in Word.split_segment(segment, max_bytes):
+                piece_bytes = len(piece.encode('utf-8')) + 1
+                if chunk and chunk_bytes + piece_bytes > max_bytes:
+                    chunk_list.append(chunk)
+                    chunk = []
+                    chunk_bytes = 0
+                chunk.append((i, piece))
+                chunk_bytes += piece_bytes
+
+        if chunk:
+            chunk_list.append(chunk)
+        return chunk_list
+
+    @staticmethod
+    def annotate_chunk(chunk):
+        """
+        Annotates the pieces of a chunk with one request and splits the
+        results back into the pieces by their word count
+
+        Returns:
+            result_list (list): list of (segment index, syntax list, entity list) for each piece
+        """
+        syntax_list, entity_list = Word.annotate_text(' '.join([piece for i, piece in chunk]))
+
+        result_list = []
+        start = 0
+        for i, piece in chunk:
+            end = start + len(piece.split(' '))
+            result_list.append((i, syntax_list[start:end], entity_list[start:end]))
+            start = end
+        return result_list
+
+    @staticmethod
+    def dump_nlp_result(syntax_list, entity_list):
+        """
+        Serializes the syntax and entity lists of a segment for the NLP cache
+        """
+        return json.dumps({
+            'syntax': [[word.to_list() for word in words] for words in syntax_list],
+            'entity': entity_list
+        })
+
+    @staticmethod
+    def load_nlp_result(value):
+        """
+        Deserializes the syntax and entity lists of a segment from the NLP cache
+        """
+        result = json.loads(value)
+        syntax_list = [[Word.from_list(word) for word in words] for words in result['syntax']]
+        return syntax_list, result['entity']
+
+    @staticmethod
+    def annotate_text(text):
+        """
+        Gets the syntax and the entities of the text with a single
+        annotateText request instead of two separate requests
+
+        Args:
+            text (str): the words of the text seperated by spaces
+
+        Returns:
+            syntax_list (list): a list of [Word] for each word in the text
+            entity_list (list): a list of the entity dict or None for each word in the text
+        """
+        if isinstance(text, six.binary_type):
+            text = text.decode('utf-8')
+        client = clients.get_language_client()
+
+        # Instantiates a plain text document.
+        document = types.Document(
+            content=text,
+            type=enums.Document.Type.PLAIN_TEXT)
+        features = types.AnnotateTextRequest.Features(
+            extract_syntax=True,
+            extract_entities=True)
+
+        response = client.annotate_text(document, features, encoding_type='UTF8')
+
+        return Word.get_syntax_list(text, response.tokens), Word.get_entity_list(text, response.entities)
+
     @staticmethod
     def analyze_text_syntax(text):
         if isinstance(text, six.binary_type):
             text = text.decode('utf-8')
-        client = language.LanguageServiceClient()
+        client = clients.get_language_client()
 
         # Instantiates a plain text document.
         document = types.Document(
@@ -57,50 +301,66 @@ class Word:
             type=enums.Document.Type.PLAIN_TEXT)
 
         # Detects tokens in the document.
-        tokens = client.analyze_syntax(document).tokens
+        tokens = client.analyze_syntax(document, encoding_type='UTF8').tokens
+
+        return Word.get_syntax_list(text, tokens)
+
+    @staticmethod
+    def get_word_offsets(text):
+        """
+        Gets the table of UTF8 byte offsets of the words of the text, the
+        word of any byte offset is the last word starting at or before it
+
+        Args:
+            text (str): the words of the text seperated by spaces
+
+        Returns:
+            word_offsets (list): the byte offset of the start of each word
+        """
+        word_offsets = []
+        offset = 0
+        for word in text.split(' '):
+            word_offsets.append(offset)
+            offset += len(word.encode('utf-8')) + 1
+        return word_offsets
 
+    @staticmethod
+    def get_syntax_list(text, tokens):
+        """
+        Matches the tokens from the NLP lib with the words of the text in a
+        single pass using the UTF8 byte offsets of the tokens. A word gets
+        every token starting in it, or the token that spans over it.
+
+        Returns:
+            word_obj_list (list): a list of [Word] for each word in the text
+        """
         text_list = text.split(' ')
-        word_obj_list = []
-        count = 0
-
-        # creates a list of [Word] to match syntax with Word
-        for i, word in enumerate(text_list):
-            token = tokens[count]
-            token_text = token.text.content.replace(' ', '')
-            is_same_word = token_text == text_list[i]
-            if is_same_word:
-                word_obj_list.append([Word(token=token)])
-                count += (1 if count < len(tokens) - 1 else 0)
-
-            # multiple tokens per word
-            elif token_text in text_list[i]:
-                remaining_word = text_list[i].replace(token_text, '', 1)
-                temp_list = []
-                temp_list.append(Word(token=token))
-                while remaining_word != '':
-                    count += 1
-                    token = tokens[count]
-                    token_text = token.text.content.replace(' ', '')
-                    if token_text in remaining_word:
-                        temp_list.append(Word(token=token))
-                        remaining_word = remaining_word.replace(token_text, '', 1)
-                    else:
-                        print(token_text)
-                        print(remaining_word)
-                        print([str(word) for word in temp_list])
-                        print('Internal NLP Error')
-                        count -= 1
-                        break
-                word_obj_list.append(temp_list)
-                count += 1
-
-            # multiple words per token
-            elif text_list[i] in token_text:
-                word_obj_list.append([Word(token=token)])
-                if token_text[-len(text_list[i]):] == text_list[i]:
-                    count += 1
-            else:
-                word_obj_list.append([Word(text=word)])
+        word_offsets = Word.get_word_offsets(text)
+        word_obj_list = [[] for _ in text_list]
+
+        word_idx = 0
+        last_word = None
+        last_end = 0
+        for token in tokens:
+            begin = token.text.begin_offset
+            # tokens are in order so the word index only moves forward
+            while word_idx < len(word_offsets) - 1 and word_offsets[word_idx + 1] <= begin:
+                word_idx += 1
+                if last_end > word_offsets[word_idx]:
+                    word_obj_list[word_idx].append(last_word)
+
+            last_word = Word(token=token)
+            last_end = begin + len(token.text.content.encode('utf-8'))
+            word_obj_list[word_idx].append(last_word)
+
+        # trailing words covered by the last token
+        while word_idx < len(word_offsets) - 1 and word_offsets[word_idx + 1] < last_end:
+            word_idx += 1
+            word_obj_list[word_idx].append(last_word)
+
+        for i, words in enumerate(word_obj_list):
+            if not words:
+                word_obj_list[i] = [Word(text=text_list[i])]
 
         return word_obj_list
 
@@ -109,7 +369,7 @@ class Word:
     def analyze_text_entities(text):
         if isinstance(text, six.binary_type):
             text = text.decode('utf-8')
-        client = language.LanguageServiceClient()
+        client = clients.get_language_client()
 
         # Instantiates a plain text document.
         document = types.Document(
@@ -117,38 +377,69 @@ class Word:
             type=enums.Document.Type.PLAIN_TEXT)
 
         entities = client.analyze_entities(document, encoding_type='UTF8').entities
-        ent_obj_list = [None] * len(text.split(' '))
 
-        consumed_ent_idx = []
+        return Word.get_entity_list(text, entities)
+
+    @staticmethod
+    def get_entity_list(text, entities):
+        """
+        Matches the entity mentions from the NLP lib with the words of the text.
+        The mention offsets are expected to be UTF8 byte offsets.
+
+        Returns:
+            ent_obj_list (list): a list of the entity dict or None for each word in the text
+        """
+        word_offsets = Word.get_word_offsets(text)
+        ent_obj_list = [None] * len(word_offsets)
+
+        consumed_ent_idx = set()
         for entity in entities:
+            ent_wiki = entity.metadata.wikipedia_url if hasattr(entity, 'metadata') and hasattr(entity.metadata, 'wikipedia_url') else None
+            ent_obj = {
+                'type': entity.type,
+                'salience': entity.salience,
+                'content': entity.name,
+                'wiki': ent_wiki
+            }
+            ent_len = len(entity.name.split(' '))
+
             for mention in entity.mentions:
                 if entity.name != mention.text.content:
                     continue
 
-                ent_location = mention.text.begin_offset
-                words = text.encode('utf-8')[:ent_location].decode('utf-8').split(' ')
-                ent_idx = len([w for w in words if w != ''])
+                # the word the mention starts in
+                ent_idx = bisect.bisect_right(word_offsets, mention.text.begin_offset) - 1
 
-                for i, word in enumerate(entity.name.split(' ')): 
-                    if i+ent_idx >= len(ent_obj_list) or i+ent_idx in consumed_ent_idx:
+                for i in range(ent_idx, min(ent_idx + ent_len, len(ent_obj_list))):
+                    if i in consumed_ent_idx:
                         break
-                    consumed_ent_idx.append(i+ent_idx)
-                    ent_type = entity.type
-                    ent_salience = entity.salience
-                    ent_content = entity.name
-                    ent_wiki = entity.metadata.wikipedia_url if hasattr(entity, 'metadata') and hasattr(entity.metadata, 'wikipedia_url') else None
-                    ent_obj_list[ent_idx+i] = {
-                        'type': ent_type,
-                        'salience': ent_salience,
-                        'content': ent_content,
-                        'wiki': ent_wiki
-                    }
+                    consumed_ent_idx.add(i)
+                    ent_obj_list[i] = dict(ent_obj)
         return ent_obj_list
 
 
     def __str__(self):
         return self.content
 
+
+class EntityWord(Word):
+    __slots__ = ()
+
+    def __init__(self, word, entity, salience, content, wiki):
+        """
+        Overlays an entity on a word of the syntax list so the word, which is
+        shared by every view over the paragraph, is not modified
+
+        Args:
+            word (Word): the last word of the entity
+            entity (int): the entity type from the NLP lib
+            salience (float): the salience of the entity
+            content (str): the words of the entity
+            wiki (str): the wikipedia url of the entity
+        """
+        self.part_of_speech = word.part_of_speech
+        self.add_entity(entity, salience, content, wiki)
+
 if __name__ == "__main__":
     a = Word.analyze_text_syntax("• I cannot couldn't • wouldn't eat food")
     #print([entity['content'] if entity else None for entity in a])
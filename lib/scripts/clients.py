@@ -0,0 +1,100 @@
+from google.cloud import vision
+from google.cloud import language
+from google.cloud import bigquery
+
+import threading
+import os
+import grpc
+
+# the clients are shared by all the request threads of a worker process
+_lock = threading.Lock()
+_clients = {}
+_pid = None
+_stats = {}
+
+
+def _get_client(name, create_client):
+    """
+    Gets the client from the registry and creates it the first time it is
+    used in this process. The registry is cleared after a fork so gRPC
+    channels are never shared between gunicorn workers.
+
+    Args:
+        name (str): name of the client in the registry
+        create_client (function): function that creates the client
+
+    Returns:
+        client (obj): the shared client
+    """
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            _clients.clear()
+            _stats.clear()
+            _pid = os.getpid()
+
+        stats = _stats.setdefault(name, {'created': 0, 'reused': 0})
+        if name in _clients:
+            stats['reused'] += 1
+            return _clients[name]
+
+    # the client is created outside the lock because creating one can get
+    # another client from the registry, e.g. the upload table uses the BigQuery client
+    client = create_client()
+
+    with _lock:
+        stats = _stats.setdefault(name, {'created': 0, 'reused': 0})
+        if name in _clients:
+            # another thread created the client first, its client is the shared one
+            stats['reused'] += 1
+            return _clients[name]
+        _clients[name] = client
+        stats['created'] += 1
+        return client
+
+def get_vision_client():
+    return _get_client('vision', vision.ImageAnnotatorClient)
+
+def get_language_client():
+    return _get_client('language', language.LanguageServiceClient)
+
+def get_bigquery_client():
+    return _get_client('bigquery', bigquery.Client)
+
+def get_upload_table():
+    """
+    Gets the BigQuery table that the upload requests are logged to. The
+    table schema is only fetched once per process.
+    """
+    def get_table():
+        bq_client = get_bigquery_client()
+        table_ref = bq_client.dataset('logs').table('upload_post_requests')
+        return bq_client.get_table(table_ref)
+    return _get_client('upload_table', get_table)
+
+def warmup(timeout=10):
+    """
+    Creates the clients and connects their gRPC channels so the first request
+    of the worker does not pay for the channel setup, TLS and auth
+    """
+    for get_client in (get_vision_client, get_language_client):
+        channel = getattr(getattr(get_client(), 'transport', None), 'channel', None)
+        if channel is None:
+            continue
+        try:
+            grpc.channel_ready_future(channel).result(timeout=timeout)
+        except grpc.FutureTimeoutError:
+            print('gRPC channel was not ready after %s seconds' % timeout)
+
+    try:
+        get_upload_table()
+    except Exception as e:
+        print('Could not warm up BigQuery client: %s' % e)
+
+def get_stats():
+    """
+    Returns:
+        stats (dict): the number of times each client was created and reused in this process
+    """
+    with _lock:
+        return { name: dict(stats) for name, stats in _stats.items() }
@@ -0,0 +1,195 @@
+import argparse
+import itertools
+import os
+
+import numpy as np
+
+# prefix of the binary store, the files are <prefix>.vocab.npy and <prefix>.vectors.npy
+EMBEDDINGS_PATH = os.environ.get('EMBEDDINGS_PATH', 'glove.6B.100d')
+# store with only the vocab that is looked up, built with lib/scripts/prune_embeddings.py
+PRUNED_EMBEDDINGS_PATH = os.environ.get('PRUNED_EMBEDDINGS_PATH', EMBEDDINGS_PATH + '.pruned')
+# float16 halves and int8 quarters the memory of the vectors
+EMBEDDINGS_DTYPE = os.environ.get('EMBEDDINGS_DTYPE', 'float32')
+DTYPES = ('float32', 'float16', 'int8')
+
+# versions of the stores that were not loaded from files, unlike id() they are never reused
+_versions = itertools.count()
+
+class WordEmbeddings:
+    def __init__(self, vocab, vectors, scales=None, version=None):
+        """
+        Dict-like facade over the binary embedding store so it can be used
+        wherever the dict of word vectors was used. Quantized vectors are
+        converted back to float32 when they are looked up.
+
+        Args:
+            vocab (ndarray): sorted bytes array of the utf-8 encoded words
+            vectors (ndarray): matrix with the vector of each word in `vocab` order
+            scales (ndarray): the scale of each row of int8 vectors
+            version (str): identifies the vectors, e.g. in cache keys. Defaults to
+                a version that is unique in the process
+
+        Attributes:
+            version (str): the version of the vectors
+        """
+        self.vocab = vocab
+        self.vectors = vectors
+        self.scales = scales
+        self.version = version or 'memory:%s' % next(_versions)
+        self.dim = vectors.shape[1]
+
+    def get_vector(self, idx):
+        vector = self.vectors[idx].astype(np.float32)
+        if self.scales is not None:
+            vector *= self.scales[idx]
+        return vector
+
+    def get_nbytes(self):
+        """
+        Returns:
+            nbytes (int): the size of the vectors and the vocab
+        """
+        return self.vocab.nbytes + self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def get_index(self, word):
+        """
+        Gets the row of the word in the store with a binary search over the vocab
+
+        Returns:
+            idx (int): the row of the word or -1 if it is not in the vocab
+        """
+        key = word.encode('utf-8')
+        idx = int(np.searchsorted(self.vocab, key))
+        if idx < len(self.vocab) and self.vocab[idx] == key:
+            return idx
+        return -1
+
+    def get(self, word, default=None):
+        idx = self.get_index(word)
+        return self.get_vector(idx) if idx >= 0 else default
+
+    def __getitem__(self, word):
+        idx = self.get_index(word)
+        if idx < 0:
+            raise KeyError(word)
+        return self.get_vector(idx)
+
+    def __contains__(self, word):
+        return self.get_index(word) >= 0
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def __iter__(self):
+        return (word.decode('utf-8') for word in self.vocab)
+
+
+def get_paths(prefix, dtype='float32'):
+    """
+    Returns:
+        paths (tuple): the vocab and vectors paths, and the scales path for int8
+    """
+    if dtype == 'float32':
+        return prefix + '.vocab.npy', prefix + '.vectors.npy'
+    if dtype == 'int8':
+        return prefix + '.vocab.npy', prefix + '.vectors.int8.npy', prefix + '.scales.npy'
+    return prefix + '.vocab.npy', prefix + '.vectors.%s.npy' % dtype
+
+def exists(prefix=EMBEDDINGS_PATH, dtype='float32'):
+    return all([os.path.exists(path) for path in get_paths(prefix, dtype)])
+
+def load(prefix=EMBEDDINGS_PATH, dtype='float32'):
+    """
+    Memory maps the binary store, the pages are read lazily and shared by
+    every process that maps the same files
+
+    Args:
+        dtype (str): 'float32' or one of the quantized stores, 'float16' or 'int8'
+
+    Returns:
+        word_embeddings (WordEmbeddings): the dict-like store, its version is
+            the prefix, the dtype and the modification time of the files
+    """
+    paths = get_paths(prefix, dtype)
+    arrays = [np.load(path, mmap_mode='r') for path in paths]
+    version = '%s:%s:%s' % (prefix, dtype, max([os.path.getmtime(path) for path in paths]))
+    return WordEmbeddings(*arrays, version=version)
+
+def quantize(vectors, dtype):
+    """
+    Quantizes the float32 vectors. int8 vectors have a scale per row so
+    every row uses the full int8 range.
+
+    Returns:
+        vectors (ndarray), scales (ndarray): the quantized vectors and the scales (None unless int8)
+    """
+    if dtype == 'float32':
+        return np.asarray(vectors, dtype=np.float32), None
+    if dtype == 'float16':
+        return np.asarray(vectors, dtype=np.float16), None
+
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+def save_quantized(prefix, dtype):
+    """
+    Writes the quantized vectors of the float32 store next to it, the vocab is shared
+    """
+    quantized, scales = quantize(load(prefix).vectors, dtype)
+    paths = get_paths(prefix, dtype)
+    np.save(paths[1], quantized)
+    if scales is not None:
+        np.save(paths[2], scales)
+    print('saved %s vectors of %s' % (dtype, prefix))
+
+def save(prefix, words, vectors):
+    """
+    Sorts the words and saves them with their vectors as a binary store
+
+    Args:
+        words (list): the words of the vectors
+        vectors (ndarray): matrix with the vector of each word
+    """
+    vocab = np.array([word.encode('utf-8') for word in words])
+    order = np.argsort(vocab, kind='stable')
+    vocab_path, vectors_path = get_paths(prefix)
+    np.save(vocab_path, vocab[order])
+    np.save(vectors_path, np.ascontiguousarray(vectors[order], dtype=np.float32))
+
+def read_glove(txt_path):
+    """
+    Parses the GloVe text file
+
+    Returns:
+        words (list), vectors (ndarray): the words and the float32 matrix of their vectors
+    """
+    word_rows = {}
+    rows = []
+    with open(txt_path, encoding='utf-8') as f:
+        for line in f:
+            values = line.split()
+            # a repeated word overwrites the previous vector like the dict did
+            word_rows[values[0]] = len(rows)
+            rows.append(np.asarray(values[1:], dtype='float32'))
+    return list(word_rows), np.vstack(rows)[list(word_rows.values())]
+
+def convert_glove(txt_path, prefix):
+    """
+    One time conversion of the GloVe text file to the binary store
+    """
+    words, vectors = read_glove(txt_path)
+    save(prefix, words, vectors)
+    print('saved %s words of %s dimensions to %s' % (len(words), vectors.shape[1], prefix))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Converts a GloVe text file to the memory mapped binary store')
+    parser.add_argument('txt_path', help='path to the GloVe text file, e.g. glove.6B.100d.txt')
+    parser.add_argument('prefix', nargs='?', default=EMBEDDINGS_PATH, help='prefix of the binary store files')
+    parser.add_argument('--dtype', choices=DTYPES, default='float32', help='also writes the vectors quantized to this type')
+    args = parser.parse_args()
+    convert_glove(args.txt_path, args.prefix)
+    if args.dtype != 'float32':
+        save_quantized(args.prefix, args.dtype)
@@ -0,0 +1,373 @@
+import io
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import cv2
+from PIL import Image
+
+from lib.scripts import mapper
+
+#image processing resources
+from skimage.filters import gaussian, threshold_otsu
+from skimage.feature import canny
+from skimage.transform import probabilistic_hough_line
+
+
+@contextmanager
+def timed(timings, stage):
+    """
+    Records the time spent in a stage of the image pipeline
+
+    Args:
+        timings (dict): the dict that the elapsed seconds are added to
+        stage (str): name of the stage
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - start
+
+# JPEG DCT scale factors that opencv can decode directly to
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+def get_reduced_decode_flag(content, max_pix_area):
+    """
+    Finds the largest JPEG scale factor that still decodes the image to
+    at least `max_pix_area` pixels. Only the header is read to get the size.
+
+    Returns:
+        flag (int): the opencv imread flag to decode the image with
+    """
+    if not max_pix_area or content[:2] != b'\xff\xd8':
+        return cv2.IMREAD_COLOR
+
+    try:
+        width, height = Image.open(io.BytesIO(content)).size
+    except IOError:
+        return cv2.IMREAD_COLOR
+
+    for scale, flag in REDUCED_DECODE_FLAGS:
+        if (width // scale) * (height // scale) >= max_pix_area:
+            return flag
+    return cv2.IMREAD_COLOR
+
+def decode_image(content, max_pix_area=None):
+    """
+    Decodes the encoded image bytes into a BGR array. Oversized JPEGs are
+    decoded straight to the nearest scale above `max_pix_area` so the full
+    resolution image is never materialized.
+
+    Args:
+        content (bytes): the encoded image
+        max_pix_area (int): the pixel budget the image is going to be resized to
+
+    Returns:
+        image (ndarray): the decoded image or None if it could not be decoded
+    """
+    nparr = np.frombuffer(content, np.uint8)
+    return cv2.imdecode(nparr, get_reduced_decode_flag(content, max_pix_area))
+
+def resize_to_area(image, max_pix_area):
+    """
+    Shrinks the image so that it has at most `max_pix_area` pixels
+    """
+    height, width = image.shape[:2]
+    if height*width <= max_pix_area:
+        return image
+
+    print('resized image!')
+    ratio = np.sqrt(max_pix_area / (height*width))
+    reduced_size = int(width * ratio), int(height * ratio)
+    return cv2.resize(image, reduced_size, interpolation=cv2.INTER_AREA)
+
+def encode_image(image, ext='jpeg', quality=75):
+    """
+    Encodes the image array into bytes. The JPEG quality and the PNG
+    compression level default to the ones PIL encoded the uploads with.
+
+    Args:
+        image (ndarray): BGR image
+        ext (str): format to encode the image with
+        quality (int): JPEG quality
+
+    Returns:
+        content (bytes): the encoded image
+    """
+    if ext == 'png':
+        ret, buf = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 6])
+    else:
+        ret, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes()
+
+# symbol height in pixels that images are scaled down to before the
+# re-OCR pass, 0 keeps the size. Off by default until the OCR text of the
+# scaled images is checked against the full size images
+OCR_GLYPH_HEIGHT = int(os.environ.get('OCR_GLYPH_HEIGHT', 0))
+# 1 sends grayscale images to the vision API, which reads the text from
+# the luminance. 0 keeps the color, e.g. for colored text on a colored background
+OCR_GRAYSCALE = int(os.environ.get('OCR_GRAYSCALE', 1))
+# JPEG quality of the payload, the quality the uploads were encoded with before
+OCR_JPEG_QUALITY = int(os.environ.get('OCR_JPEG_QUALITY', 75))
+# images whose most common color covers this fraction of the sampled pixels
+# have a flat background (screenshots, rendered pages) and are sent as PNG
+OCR_PNG_FLAT_FRACTION = 0.5
+
+def get_ocr_format(image, step=8):
+    """
+    Picks the format of the image sent to the vision API from a sample of
+    its pixels instead of encoding it twice. A flat background compresses
+    better losslessly as PNG, photos are smaller as JPEG.
+
+    Args:
+        image (ndarray): BGR or grayscale image
+        step (int): the sampled pixels are `step` pixels apart
+
+    Returns:
+        ext (str): 'png' or 'jpeg'
+    """
+    sample = image[::step, ::step].astype(np.int32)
+    if sample.ndim == 3:
+        sample = (sample[..., 0] << 16) | (sample[..., 1] << 8) | sample[..., 2]
+    values, counts = np.unique(sample, return_counts=True)
+    return 'png' if counts.max() >= OCR_PNG_FLAT_FRACTION * sample.size else 'jpeg'
+
+def encode_for_ocr(image, glyph_height=None):
+    """
+    Encodes the image for the vision API as PNG or high quality JPEG,
+    whichever `get_ocr_format` picks. With `OCR_GRAYSCALE` the image is
+    converted to grayscale, and with `OCR_GLYPH_HEIGHT` it is scaled down
+    so that the symbols are that many pixels tall.
+
+    Args:
+        image (ndarray): BGR or grayscale image
+        glyph_height (float): the average symbol height in pixels if it is known from a previous OCR pass
+
+    Returns:
+        content (bytes): the encoded image
+        ocr_image (ndarray): the image that was encoded
+    """
+    ocr_image = image
+    if OCR_GRAYSCALE and ocr_image.ndim == 3:
+        ocr_image = cv2.cvtColor(ocr_image, cv2.COLOR_BGR2GRAY)
+
+    if OCR_GLYPH_HEIGHT and glyph_height and glyph_height > OCR_GLYPH_HEIGHT:
+        height, width = ocr_image.shape[:2]
+        scale = OCR_GLYPH_HEIGHT / glyph_height
+        reduced_size = max(int(width * scale), 1), max(int(height * scale), 1)
+        ocr_image = cv2.resize(ocr_image, reduced_size, interpolation=cv2.INTER_AREA)
+
+    ext = get_ocr_format(ocr_image)
+    return encode_image(ocr_image, ext, OCR_JPEG_QUALITY), ocr_image
+
+def get_doc_border(image):
+    """
+    Gets the borders around the page in the image using edge detection
+
+    Args:
+        image (ndarray): BGR image
+
+    Returns:
+        rect (list): 4 points representing polygon containing the document or None
+        image_scale (int): the scale the image was shrunk by to find the border
+    """
+    # resizing because opencv does not work well with bigger images
+    height, width = image.shape[:2]
+    max_pix_area = 1000*1000
+    image_scale = 1
+
+    if height*width > max_pix_area:
+        # find image scale by finding an integer value that fits the area
+        while (height*width)/image_scale > max_pix_area: image_scale += 1
+        image = cv2.resize(image, (int(width/image_scale), int(height/image_scale)))
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)  #RGB To Gray Scale
+    blurred = cv2.GaussianBlur(gray, (5,5), 0)  #(5,5) is the kernel size and 0 is sigma that determines the amount of blur
+
+    # find OTSU threshold for Canny edge detection
+    ret, thres = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
+
+    # Canny edge
+    edged = cv2.Canny(blurred, ret*0.2, ret)
+
+    # Find external contours only
+    contours, hierarchy = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)  #retrieve the contours as a list, with simple apprximation model
+    if not contours:
+        return None, image_scale
+    largest_contour = max(contours, key=lambda c: cv2.arcLength(c, True))
+
+    # Create a hull from the contours (draws a polygon around the points to reduce it to 4 points)
+    hull = cv2.convexHull(largest_contour, False)
+
+    pts = cv2.approxPolyDP(hull, 0.02*cv2.arcLength(hull, True), True)
+    if len(pts) != 4:
+        return None, image_scale
+
+    rect = mapper.order_points(pts)
+    return rect * image_scale, image_scale
+
+# minimum number of words needed to estimate the skew from the word boxes
+MIN_DESKEW_WORDS = 10
+
+def fold_angle(angle):
+    """
+    Folds angles into [-45, 45) degrees so that 'sideways' alignments are not rotated
+    """
+    return (np.asarray(angle) + 45) % 90 - 45
+
+def get_word_skew_angle(word_boxes, min_words=MIN_DESKEW_WORDS):
+    """
+    Finds the angle the text is skewed by from the baselines of the oriented
+    word boxes returned by the vision API
+
+    Args:
+        word_boxes (ndarray): N x 4 x 2 array of the vertices of the words in
+            (top left, top right, bottom right, bottom left) text order
+        min_words (int): minimum number of words needed for the estimate
+
+    Returns:
+        rotation_number (float): the angle in degrees to rotate the image by or
+            None if there are too few words
+    """
+    if len(word_boxes) < min_words:
+        return None
+
+    # baselines go from the bottom left to the bottom right vertex
+    baselines = word_boxes[:, 2] - word_boxes[:, 3]
+    lengths = np.hypot(baselines[:, 0], baselines[:, 1])
+
+    # short words (punctuation, single letters) give noisy angles
+    is_long = lengths >= np.median(lengths)
+    if np.count_nonzero(is_long) < min_words // 2:
+        return None
+
+    angles = fold_angle(np.degrees(np.arctan2(baselines[is_long, 1], baselines[is_long, 0])))
+
+    # median of the angles within 3 median absolute deviations of the median
+    median = np.median(angles)
+    mad = np.median(np.abs(angles - median))
+    inliers = angles[np.abs(angles - median) <= 3 * mad + 1e-6]
+
+    return float(np.median(inliers))
+
+def get_skew_angle(image):
+    """
+    Finds the angle the text in the image is skewed by using hough lines.
+    The skew process does not take into account images that are
+    skewed more than 45 degrees.
+
+    Args:
+        image (ndarray): BGR image
+
+    Returns:
+        rotation_number (float): the angle in degrees to rotate the image by
+    """
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    #threshold to get rid of extraneous noise
+    thresh = threshold_otsu(image)
+    normalize = image > thresh
+
+    # gaussian blur
+    blur = gaussian(normalize, 3)
+
+    # canny edges in scikit-image
+    edges = canny(blur)
+
+    # hough lines
+    hough_lines = probabilistic_hough_line(edges)
+
+    # hough lines returns a list of points, in the form ((x1, y1), (x2, y2))
+    # representing line segments. the first step is to calculate the slopes of
+    # these lines from their paired point values
+    slopes = [(y2 - y1)/(x2 - x1) if (x2-x1) else 0 for (x1,y1), (x2, y2) in hough_lines]
+
+    # it just so happens that this slope is also y where y = tan(theta), the angle
+    # in a circle by which the line is offset
+    rad_angles = [np.arctan(x) for x in slopes]
+
+    # and we change to degrees for the rotation
+    deg_angles = [np.degrees(x) for x in rad_angles]
+
+    # which of these degree values is most common?
+    histo = np.histogram(deg_angles, bins=180)
+
+    # correcting for 'sideways' alignments
+    rotation_number = histo[1][np.argmax(histo[0])]
+
+    if rotation_number > 45:
+        rotation_number = -(90-rotation_number)
+    elif rotation_number < -45:
+        rotation_number = 90 - abs(rotation_number)
+
+    return rotation_number
+
+def rotate_image(image, angle):
+    """
+    Rotates the image counter clockwise by `angle` degrees and expands the
+    image so that none of it is cropped
+    """
+    height, width = image.shape[:2]
+    M = cv2.getRotationMatrix2D((width/2, height/2), angle, 1.0)
+
+    # find the size of the rotated image and move the center into it
+    cos, sin = abs(M[0, 0]), abs(M[0, 1])
+    new_width = int(round(height*sin + width*cos))
+    new_height = int(round(height*cos + width*sin))
+    M[0, 2] += new_width/2 - width/2
+    M[1, 2] += new_height/2 - height/2
+
+    return cv2.warpAffine(image, M, (new_width, new_height), flags=cv2.INTER_CUBIC)
+
+def preprocess(image, word_boxes):
+    """
+    Runs the CPU bound pre-processing stages on the image: border detection,
+    perspective correction and deskew. It only takes and returns picklable
+    objects so that it can be run in the pre-processing process pool.
+
+    Args:
+        image (ndarray): the BGR image that was OCR'd
+        word_boxes (ndarray): N x 4 x 2 vertices of the words found in the image
+
+    Returns:
+        result (dict): { 'image':.., 'doc_border':.., 'image_scale':.., 'is_corrected_perspective':..,
+            'is_deskewed':.., 'timings':.. } where 'image' is None if the image did not change
+    """
+    timings = {}
+    process_img = image
+
+    with timed(timings, 'doc_border'):
+        doc_border, image_scale = get_doc_border(image)
+        # only corrects the perspective if all the words are in the document border
+        is_corrected_perspective = doc_border is not None and \
+            bool(mapper.points_in_polygon(word_boxes.reshape(-1, 2), doc_border).all())
+
+    if is_corrected_perspective:
+        with timed(timings, 'perspective'):
+            process_img = mapper.four_point_transform(process_img, doc_border)
+            word_boxes = mapper.transform_points(word_boxes, doc_border)
+
+    with timed(timings, 'deskew'):
+        # falls back to hough lines when there are too few words
+        rotation_number = get_word_skew_angle(word_boxes)
+        if rotation_number is None:
+            rotation_number = get_skew_angle(process_img)
+
+        is_deskewed = abs(rotation_number) >= 0.3
+        if is_deskewed:
+            process_img = rotate_image(process_img, rotation_number)
+
+    return {
+        'image': process_img if process_img is not image else None,
+        'doc_border': doc_border,
+        'image_scale': image_scale,
+        'is_corrected_perspective': is_corrected_perspective,
+        'is_deskewed': is_deskewed,
+        'timings': timings
+    }
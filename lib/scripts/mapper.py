@@ -27,7 +27,7 @@ def order_points(pts):
     # return the ordered coordinates
     return rect
 
-def four_point_transform(image, pts):
+def get_perspective_matrix(pts):
     # obtain a consistent order of the points and unpack them
     # individually
     rect = order_points(pts)
@@ -58,62 +58,64 @@ def four_point_transform(image, pts):
         [maxWidth - 1, maxHeight - 1],
         [0, maxHeight - 1]], dtype = "float32")
  
-    # compute the perspective transform matrix and then apply it
+    # compute the perspective transform matrix
     M = cv2.getPerspectiveTransform(rect, dst)
-    warped = cv2.warpPerspective(image, M, (maxWidth, maxHeight))
+
+    return M, (maxWidth, maxHeight)
+
+def four_point_transform(image, pts):
+    # compute the perspective transform matrix and then apply it
+    M, size = get_perspective_matrix(pts)
+    warped = cv2.warpPerspective(image, M, size)
  
     # return the warped image
     return warped
 
-def check_in_polygon(pt, polygon_pts):
+def transform_points(pts, polygon_pts):
     """
-    Uses the ray casting algorithm to check if a point is in
-    the polygon. 
+    Maps points from the original image into the image warped by
+    `four_point_transform` with the same polygon
 
     Args:
-        pt (tuple): x,y coordinate of point to be analyzed
-        polygon_pts (list): the points in the polygon
-        image_scale (int): the scale the polygon box should be scaled to
+        pts (ndarray): array of x,y coordinates with the last dimension of size 2
+        polygon_pts (list): the points in the polygon used to warp the image
 
     Returns:
-        in_polygon (bool): a bool that indicates if the point is in the polygon
+        warped_pts (ndarray): the points in the warped image with the same shape as `pts`
     """
-    # get list of slopes connecting points
-    slope_list = [ get_slope(polygon_pts, i) for i, poly_pt in enumerate(polygon_pts) ]
-    # loops each slope and check if point crosses slope to the right
-    slope_cross_list = []
-    for slope in slope_list:
-        if 'slope' in slope:
-            is_cross_slope =  pt[0] < (pt[1]-slope['b'])/slope['slope'] < slope['max_x']
-        else:
-            if 'same_x' in slope:
-                is_cross_slope = pt[0] < slope['same_x']
-            else:
-                is_cross_slope = False
-        slope_cross_list.append(is_cross_slope)
-        
-    num_slope_cross = sum(slope_cross_list)
-    in_polygon = False if num_slope_cross == 0 else bool(num_slope_cross%2)
+    pts = np.asarray(pts)
+    M, size = get_perspective_matrix(polygon_pts)
+    warped_pts = cv2.perspectiveTransform(pts.reshape(-1, 1, 2).astype(np.float32), M)
+    return warped_pts.reshape(pts.shape)
 
-    return in_polygon
-    
-
-def get_slope(polygon_pts, i, image_scale=1):
+def points_in_polygon(pts, polygon_pts):
     """
-    Finds slope from current to next point and returns object
+    Uses the ray casting algorithm to check a batch of points against the
+    polygon in one pass. An edge is only counted if it straddles the
+    horizontal ray of the point, so horizontal edges and edges above or
+    below the point are never crossed. The old per-point check counted
+    every vertical edge to the right of the point and every sloped edge
+    whose crossing was left of its max x, whatever their y range.
+
+    Args:
+        pts (ndarray): N x 2 array of x,y coordinates of the points to be analyzed
+        polygon_pts (list): the points in the polygon
+
+    Returns:
+        in_polygon (ndarray): N bool array that indicates if each point is in the polygon
     """
-    sec_pt_idx = i+1 if i+1 != len(polygon_pts) else 0
-    y2 = polygon_pts[sec_pt_idx][1]
-    y1 = polygon_pts[i][1]
-    x2 = polygon_pts[sec_pt_idx][0]
-    x1 = polygon_pts[i][0]
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    polygon_pts = np.asarray(polygon_pts, dtype=np.float64).reshape(-1, 2)
 
-    if x2 == x1:
-        return { 'same_x': x1 }
-    if y2 == y1:
-        return { 'same_y': y1 }
+    # N x 1 point coordinates against the M edges of the polygon
+    x, y = pts[:, 0:1], pts[:, 1:2]
+    x1, y1 = polygon_pts[:, 0], polygon_pts[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
 
-    slope = (y2-y1)/(x2-x1)
-    b = y1 - slope*x1 
+    # an edge is crossed if it straddles the horizontal ray going right from the point
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cross_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    num_slope_cross = np.sum(straddles & (x < cross_x), axis=1)
 
-    return { 'slope': slope, 'b': b, 'max_x': max(x1, x2) }
+    return num_slope_cross % 2 == 1
@@ -0,0 +1,116 @@
+import re
+import subprocess
+
+import numpy as np
+import cv2
+import pdf2image
+from bs4 import BeautifulSoup
+
+# a letter page at 150 dpi is just above the pixel budget of the vision API
+# so rasterizing at a higher resolution is wasted work
+DPI = 150
+# minimum number of letters for the text layer of a page to be used instead of OCR
+MIN_TEXT_LAYER_CHARS = 50
+
+def get_page_count(pdf_path):
+    """
+    Gets the number of pages in the pdf using poppler's pdfinfo
+
+    Args:
+        pdf_path (str): path to the pdf file
+
+    Returns:
+        page_count (int): number of pages or 0 if the pdf could not be read
+    """
+    try:
+        out = subprocess.run(['pdfinfo', pdf_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+    except OSError:
+        return 0
+    match = re.search(r'^Pages:\s+(\d+)', out.decode('utf-8', 'ignore'), re.MULTILINE)
+    return int(match.group(1)) if match else 0
+
+def get_page_range(page_count, first_page=None, last_page=None):
+    """
+    Clamps the requested page range to the pages in the pdf
+
+    Returns:
+        page_range (range): the 1-indexed page numbers to read
+    """
+    first_page = max(first_page or 1, 1)
+    last_page = min(last_page or page_count, page_count)
+    return range(first_page, last_page + 1)
+
+def rasterize_page(pdf_path, page_num, dpi):
+    """
+    Rasterizes a single page of the pdf
+
+    Returns:
+        image (ndarray): BGR image of the page or None
+    """
+    pages = pdf2image.convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num, fmt='jpeg')
+    if not pages:
+        return None
+    return cv2.cvtColor(np.asarray(pages[0].convert('RGB')), cv2.COLOR_RGB2BGR)
+
+def get_text_layer(pdf_path, page_num, dpi):
+    """
+    Gets the words and their bounding boxes from the text layer of a page
+    using poppler's pdftotext. Coordinates are scaled from points to the
+    pixels the page would have if it was rasterized at `dpi`.
+
+    Args:
+        pdf_path (str): path to the pdf file
+        page_num (int): 1-indexed page number
+        dpi (int): the resolution the coordinates are scaled to
+
+    Returns:
+        blocks (list): blocks of (text, (x_min, y_min, x_max, y_max)) words in reading order
+            or None if the page has no usable text layer
+    """
+    try:
+        out = subprocess.run(['pdftotext', '-f', str(page_num), '-l', str(page_num), '-bbox-layout', pdf_path, '-'],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+    except OSError:
+        return None
+
+    scale = dpi / 72
+    blocks = []
+    for block in BeautifulSoup(out.decode('utf-8', 'ignore'), 'html.parser').find_all('block'):
+        words = []
+        for word in block.find_all('word'):
+            text = word.get_text().strip()
+            if not text:
+                continue
+            box = tuple(float(word[key]) * scale for key in ('xmin', 'ymin', 'xmax', 'ymax'))
+            words.append((text, box))
+        if words:
+            blocks.append(words)
+
+    if sum([len(re.sub(r'[^a-zA-Z]', '', text)) for words in blocks for text, box in words]) < MIN_TEXT_LAYER_CHARS:
+        return None
+    return blocks
+
+def iter_pages(pdf_path, page_range, dpi):
+    """
+    Lazily reads the pages of the pdf one at a time so only the pages
+    currently being processed are held in memory. Pages are only rasterized
+    when they do not have a usable text layer.
+
+    Args:
+        pdf_path (str): path to the pdf file
+        page_range (range): the 1-indexed page numbers to read
+        dpi (int): the resolution to rasterize the pages with
+
+    Yields:
+        page_num (int), words (list), image (ndarray): the page number and either
+            the blocks of words of the text layer or the BGR image of the page
+    """
+    for page_num in page_range:
+        words = get_text_layer(pdf_path, page_num, dpi)
+        if words:
+            yield page_num, words, None
+            continue
+
+        image = rasterize_page(pdf_path, page_num, dpi)
+        if image is not None:
+            yield page_num, None, image
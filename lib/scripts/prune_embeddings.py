@@ -0,0 +1,131 @@
+from collections import Counter
+import argparse
+
+import numpy as np
+
+from lib.scripts import embeddings
+from lib.scripts import text_summarize
+
+
+def read_frequency_list(path):
+    """
+    Reads a word frequency list with a word and its count on each line. A
+    line with only a word is counted as 1 so a plain word list keeps its order.
+    The words are cleaned like `text_summarize` cleans the sentences, so
+    only the lowercase letters of the words that are not stopwords are kept.
+    Lines with a count that is not a number are skipped.
+
+    Returns:
+        word_counts (Counter): the count of each word
+    """
+    word_counts = Counter()
+    num_skipped = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            values = line.split()
+            if not values:
+                continue
+            try:
+                count = int(values[1]) if len(values) > 1 else 1
+            except ValueError:
+                num_skipped += 1
+                continue
+            # a word like "don't" is cleaned into the words the sentences are looked up with
+            for word in text_summarize.preprocess_sentences([values[0]])[0].split():
+                word_counts[word] += count
+    if num_skipped:
+        print('skipped %s lines of %s with a count that is not a number' % (num_skipped, path))
+    return word_counts
+
+def count_corpus_words(paths):
+    """
+    Counts the words of text files (e.g. the text of past uploads) after the
+    same cleaning `text_summarize` does before looking up the vectors
+
+    Returns:
+        word_counts (Counter): the count of each word
+    """
+    word_counts = Counter()
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for clean_line in text_summarize.preprocess_sentences(f.read().splitlines()):
+                word_counts.update(clean_line.split())
+    return word_counts
+
+def prune(word_embeddings, word_counts, vocab_size):
+    """
+    Keeps the `vocab_size` most frequent words that have a vector
+
+    Returns:
+        words (list): the kept words
+        vectors (ndarray): the float32 vectors of the kept words
+        oov_counts (Counter): the words that have no vector
+        pruned_counts (Counter): the words that have a vector but did not fit in `vocab_size`
+    """
+    oov_counts = Counter()
+    found = []
+    for word, count in word_counts.most_common():
+        idx = word_embeddings.get_index(word)
+        if idx < 0:
+            oov_counts[word] = count
+        else:
+            found.append((word, idx, count))
+
+    kept = found[:vocab_size]
+    pruned_counts = Counter({ word: count for word, idx, count in found[vocab_size:] })
+    words = [word for word, idx, count in kept]
+    vectors = np.vstack([word_embeddings.get_vector(idx) for word, idx, count in kept]) if kept else np.zeros((0, word_embeddings.dim), dtype=np.float32)
+    return words, vectors, oov_counts, pruned_counts
+
+def get_oov_report(word_counts, words, oov_counts, pruned_counts, num_top=50):
+    """
+    Returns:
+        report (str): the coverage of the pruned vocab and its most frequent missing words
+    """
+    total = sum(word_counts.values())
+    kept = sum([word_counts[word] for word in words])
+    lines = [
+        'vocab size: %s of %s distinct words' % (len(words), len(word_counts)),
+        'token coverage: %.2f%% (%s of %s)' % (100 * kept / total if total else 0, kept, total),
+        'not in embeddings: %s words, %s tokens' % (len(oov_counts), sum(oov_counts.values())),
+        'pruned by vocab size: %s words, %s tokens' % (len(pruned_counts), sum(pruned_counts.values())),
+        '',
+        'most frequent words not in embeddings:'
+    ]
+    lines.extend(['  %s %s' % (word, count) for word, count in oov_counts.most_common(num_top)])
+    lines.extend(['', 'most frequent words pruned by vocab size:'])
+    lines.extend(['  %s %s' % (word, count) for word, count in pruned_counts.most_common(num_top)])
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Builds an embedding store with only the most frequent words of the uploads')
+    parser.add_argument('--frequency-list', help='file with a word and its count on each line')
+    parser.add_argument('--corpus', nargs='*', default=[], help='text files of past uploads to count the words of')
+    parser.add_argument('--vocab-size', type=int, default=50000, help='number of words to keep')
+    parser.add_argument('--source', default=embeddings.EMBEDDINGS_PATH, help='prefix of the full float32 store')
+    parser.add_argument('--output', default=embeddings.PRUNED_EMBEDDINGS_PATH, help='prefix of the pruned store')
+    parser.add_argument('--dtype', choices=embeddings.DTYPES, default='float32', help='also writes the vectors quantized to this type')
+    parser.add_argument('--report', help='writes the OOV report to this file')
+    args = parser.parse_args()
+
+    if not args.frequency_list and not args.corpus:
+        parser.error('a --frequency-list or a --corpus is required')
+
+    word_counts = Counter()
+    if args.frequency_list:
+        word_counts.update(read_frequency_list(args.frequency_list))
+    if args.corpus:
+        word_counts.update(count_corpus_words(args.corpus))
+
+    words, vectors, oov_counts, pruned_counts = prune(embeddings.load(args.source), word_counts, args.vocab_size)
+    embeddings.save(args.output, words, vectors)
+    print('saved %s words to %s' % (len(words), args.output))
+    if args.dtype != 'float32':
+        embeddings.save_quantized(args.output, args.dtype)
+
+    report = get_oov_report(word_counts, words, oov_counts, pruned_counts)
+    print(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(report + '\n')
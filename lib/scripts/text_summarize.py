@@ -1,8 +1,9 @@
 import numpy as np
 import pandas as pd
+import hashlib
+import os
 import re
-import networkx as nx
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
 
 import nltk
 from nltk.corpus import stopwords
@@ -10,16 +11,38 @@ from nltk.tokenize import sent_tokenize
 
 import requests
 
+from lib.scripts import embeddings
+from lib.Cache import LRUCache
+
+# memory for each block of rows of similarities the top k are selected from
+SPARSE_BLOCK_BYTES = int(os.environ.get('SPARSE_BLOCK_BYTES', 64 * 2**20))
+# above this many sentences the similarity graph only keeps the top k
+# neighbours of each sentence so memory grows with n * k instead of n^2.
+# The time stays O(n^2), so by default the sparse graph is only used once
+# the dense matrix and its transition matrix (16 bytes per pair) take at
+# least two blocks, below that one block holds the whole matrix anyway
+SPARSE_MIN_SENTENCES = int(os.environ.get('SPARSE_MIN_SENTENCES', 0)) or int(np.ceil(np.sqrt(2 * SPARSE_BLOCK_BYTES / 16)))
+SPARSE_TOP_K = int(os.environ.get('SPARSE_TOP_K', 20))
+
+# uploads of the same course material repeat sentences across requests
+sentence_vector_cache = LRUCache(
+    max_items=int(os.environ.get('SENTENCE_VECTOR_CACHE_ITEMS', 20000)),
+    ttl=float(os.environ.get('SENTENCE_VECTOR_CACHE_TTL', 24*60*60)))
+
+_stop_words = None
 
 # function to remove stopwords
 def remove_stopwords(sen):
-    stop_words = stopwords.words('english')
-    sen_new = " ".join([i for i in sen if i not in stop_words])
+    # the stopwords are loaded once, every sentence is cleaned before the cache lookup
+    global _stop_words
+    if _stop_words is None:
+        _stop_words = set(stopwords.words('english'))
+    sen_new = " ".join([i for i in sen if i not in _stop_words])
     return sen_new
 
 def preprocess_sentences(sentences):
     # remove punctuations, numbers and special characters
-    clean_sentences = pd.Series(sentences).str.replace("[^a-zA-Z]", " ")
+    clean_sentences = [re.sub("[^a-zA-Z]", " ", s) for s in sentences]
 
     # make alphabets lowercase
     clean_sentences = [s.lower() for s in clean_sentences]
@@ -29,7 +52,17 @@ def preprocess_sentences(sentences):
     return clean_sentences
 
 def extract_word_vec():
+    # the binary store is memory mapped so the workers share it and start in
+    # milliseconds, the pruned vocab is used when it was built
+    prefixes = [prefix for prefix in (embeddings.PRUNED_EMBEDDINGS_PATH, embeddings.EMBEDDINGS_PATH) if prefix]
+    for prefix in prefixes:
+        for dtype in (embeddings.EMBEDDINGS_DTYPE, 'float32'):
+            if embeddings.exists(prefix, dtype):
+                print('loading %s embeddings from %s' % (dtype, prefix))
+                return embeddings.load(prefix, dtype)
+
     # Extract word vectors
+    print('binary embeddings not found, parsing glove.6B.100d.txt')
     word_embeddings = {}
     f = open('glove.6B.100d.txt', encoding='utf-8')
     for line in f:
@@ -41,30 +74,174 @@ def extract_word_vec():
 
     return word_embeddings
 
+def get_sentence_key(word_embeddings, clean_sentence):
+    """
+    Gets the sentence vector cache key of the cleaned sentence, vectors of
+    different embeddings are never mixed. The dict parsed from the GloVe
+    text file has no version, there is only one of it.
+    """
+    version = getattr(word_embeddings, 'version', 'glove.6B.100d.txt')
+    return '%s:%s' % (version, hashlib.sha1(clean_sentence.encode('utf-8')).hexdigest())
+
+def get_sentence_vectors(word_embeddings, clean_sentences):
+    """
+    Averages the word vectors of each cleaned sentence
+
+    Returns:
+        sentence_vectors (ndarray): matrix with a row for each sentence
+    """
+    dim = getattr(word_embeddings, 'dim', 100)
+    sentence_vectors = np.zeros((len(clean_sentences), dim))
+    for idx, i in enumerate(clean_sentences):
+        if len(i) == 0:
+            continue
+        key = get_sentence_key(word_embeddings, i)
+        vector = sentence_vector_cache.get(key)
+        if vector is None:
+            vector = sum([word_embeddings.get(w, np.zeros((dim,))) for w in i.split()])/(len(i.split())+0.001)
+            sentence_vector_cache.set(key, vector)
+        sentence_vectors[idx] = vector
+    return sentence_vectors
+
+def get_similarity_matrix(sentence_vectors):
+    """
+    Gets the cosine similarity of every pair of sentences with one matrix
+    product of the normalized vectors. The diagonal is 0 so sentences are
+    not linked to themselves.
+    """
+    norms = np.linalg.norm(sentence_vectors, axis=1, keepdims=True)
+    # zero vectors have a similarity of 0 like in sklearn
+    norms[norms == 0] = 1
+    unit_vectors = sentence_vectors / norms
+    sim_mat = unit_vectors @ unit_vectors.T
+    np.fill_diagonal(sim_mat, 0)
+    return sim_mat
+
+def get_topk_similarity_matrix(sentence_vectors, k=SPARSE_TOP_K, block_size=None):
+    """
+    Gets the cosine similarities of each sentence with its `k` most similar
+    sentences as a sparse matrix. The graph is made symmetric like the dense
+    one, so a link is kept if either sentence is in the top k of the other.
+
+    Finding the top k still compares every pair of sentences, so the time
+    is O(n^2). Only the sparse matrix, O(n * k), is kept. The similarities
+    are computed in blocks of rows that fit in `SPARSE_BLOCK_BYTES`, so the
+    dense matrix is never held in memory.
+
+    The top k graph alone ranks the sentences poorly, only 40-60% of the top
+    30% of the dense ranking are in its top 30%, because the dense ranking
+    is dominated by the total similarity of each sentence. That total is
+    returned as the residual of the links that were left out, and `pagerank`
+    adds it back as a rank one graph, which brings the overlap to ~99%
+    (see benchmarks/bench_sparse_pagerank.py).
+
+    Args:
+        k (int): the number of neighbours of each sentence
+        block_size (int): the number of rows per block, derived from `SPARSE_BLOCK_BYTES` by default
+
+    Returns:
+        sim_mat (csr_matrix): the sparse similarity matrix
+        residual (ndarray): the similarity of each sentence with all the
+            sentences that were left out of the sparse matrix
+    """
+    n = sentence_vectors.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return sparse.csr_matrix((n, n)), np.zeros(n)
+    if block_size is None:
+        # a float64 similarity and an int64 index from argpartition per pair
+        block_size = max(1, SPARSE_BLOCK_BYTES // (16 * n))
+
+    norms = np.linalg.norm(sentence_vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    unit_vectors = sentence_vectors / norms
+    # the sum of the similarities of each row without the diagonal, as in the dense matrix
+    row_sums = unit_vectors @ unit_vectors.sum(axis=0) - (unit_vectors * unit_vectors).sum(axis=1)
+
+    rows = []
+    cols = []
+    values = []
+    for start in range(0, n, block_size):
+        block = unit_vectors[start:start+block_size] @ unit_vectors.T
+        block_rows = np.arange(start, start + block.shape[0])
+        block[block_rows - start, block_rows] = -np.inf
+        top_cols = np.argpartition(block, -k, axis=1)[:, -k:]
+        rows.append(np.repeat(block_rows, k))
+        cols.append(top_cols.ravel())
+        values.append(np.take_along_axis(block, top_cols, axis=1).ravel())
+        # the block is freed before the next one is computed so only one is held
+        del block, top_cols
+
+    topk_mat = sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+    topk_mat.eliminate_zeros()
+    # the union of both directions, maximum() would drop the negative
+    # similarities that are only in one direction against the implicit zeros
+    sim_mat = (topk_mat + topk_mat.T - topk_mat.multiply(topk_mat.T != 0)).tocsr()
+    return sim_mat, row_sums - np.asarray(sim_mat.sum(axis=1)).ravel()
+
+def pagerank(sim_mat, residual=None, alpha=0.85, max_iter=100, tol=1.0e-6):
+    """
+    PageRank of the weighted graph of the similarity matrix as a power
+    iteration, with the same defaults and convergence check as `nx.pagerank`.
+    Rows without any weight are dangling and link to every node equally.
+    The similarity matrix can be dense or sparse.
+
+    The links left out of a sparse matrix are approximated by the rank one
+    graph `residual * residual.T / sum(residual)`. It keeps the total weight
+    of each sentence, which dominates the ranking of the dense graph.
+
+    Args:
+        sim_mat (ndarray|csr_matrix): the similarity matrix
+        residual (ndarray): the weight of each row that is not in `sim_mat`
+
+    Returns:
+        scores (ndarray): the score of each sentence
+    """
+    n = sim_mat.shape[0]
+    if n == 0:
+        return np.zeros(0)
+
+    out_weights = np.asarray(sim_mat.sum(axis=1)).ravel()
+    if residual is not None and residual.sum() > 0:
+        out_weights = out_weights + residual
+    else:
+        residual = None
+    is_dangling = out_weights == 0
+    inv_weights = 1 / np.where(is_dangling, 1, out_weights)
+    if sparse.issparse(sim_mat):
+        transition_t = (sparse.diags(inv_weights) @ sim_mat).T.tocsr()
+    else:
+        transition_t = (sim_mat * inv_weights[:, None]).T
+
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        x_last = x
+        x = transition_t @ x_last + x_last[is_dangling].sum() / n
+        if residual is not None:
+            x += (x_last * inv_weights * residual).sum() * residual / residual.sum()
+        x = alpha * x + (1 - alpha) / n
+        if np.abs(x - x_last).sum() < n * tol:
+            return x
+    raise RuntimeError('pagerank failed to converge in %s iterations' % max_iter)
+
 def get_sent_scores(word_embeddings, sentences):
+    """
+    Scores the sentences with PageRank over the graph of their similarities.
+    Documents with `SPARSE_MIN_SENTENCES` or more sentences use the sparse
+    top k graph.
+
+    Returns:
+        scores (ndarray): the score of each sentence
+    """
     clean_sentences = preprocess_sentences(sentences)
 
-    # get sentence vectors
-    sentence_vectors = []
-    for i in clean_sentences:
-        if len(i) != 0:
-            v = sum([word_embeddings.get(w, np.zeros((100,))) for w in i.split()])/(len(i.split())+0.001)
-        else:
-            v = np.zeros((100,))
-        sentence_vectors.append(v)
-
-    # get similarity matrix
-    sim_mat = np.zeros([len(clean_sentences), len(clean_sentences)])
-    for i in range(len(clean_sentences)):
-        for j in range(len(clean_sentences)):
-            if i != j:
-                sim_mat[i][j] = cosine_similarity(sentence_vectors[i].reshape(1,100), sentence_vectors[j].reshape(1,100))[0,0]
-
-    # apply page rank to similarity matrix
-    nx_graph = nx.from_numpy_array(sim_mat)
-    scores = nx.pagerank(nx_graph)
-
-    return scores
+    sentence_vectors = get_sentence_vectors(word_embeddings, clean_sentences)
+    if len(sentences) >= SPARSE_MIN_SENTENCES:
+        sim_mat, residual = get_topk_similarity_matrix(sentence_vectors)
+        return pagerank(sim_mat, residual)
+
+    sim_mat = get_similarity_matrix(sentence_vectors)
+    return pagerank(sim_mat)
 
 if __name__ == "__main__":
     df = pd.read_csv("tennis_articles_v4.csv")
@@ -17,15 +17,17 @@ import logging
 import os
 import json
 from lib.Vision import Vision
+from lib.PdfReader import PdfReader
 from lib.Document import Document
 from lib.Paragraph import ParagraphHelper
 from lib.Quizlet import Quizlet
+from lib.Word import Word
 from lib.scripts import text_summarize
+from lib.scripts import clients
 import nltk
 import base64
 
 from flask import Flask, render_template, request, flash, redirect, Response, jsonify
-from google.cloud import bigquery
 from datetime import datetime
 from anytree.exporter import DictExporter
 
@@ -45,17 +47,31 @@ def init_server():
     print('initialized server')
 
 def log_upload_req(json_rows):
-    bq_client = bigquery.Client()
-    dataset_id = 'logs'
-    table_id = 'upload_post_requests'
-    table_ref = bq_client.dataset(dataset_id).table(table_id)
-    table = bq_client.get_table(table_ref)
+    bq_client = clients.get_bigquery_client()
+    table = clients.get_upload_table()
 
     errors = bq_client.insert_rows_json(table, json_rows, ignore_unknown_values=True)
 
     if errors:
         print("Big Query Error: %s" % errors)
 
+def get_vision_log(vis):
+    """
+    Gets the image processing fields of the upload log from the Vision object
+    """
+    return {
+        'doc_border': {
+            'top_left': { 'x': float(vis.doc_border[0][0]), 'y': float(vis.doc_border[0][1]) },
+            'top_right': { 'x': float(vis.doc_border[1][0]), 'y': float(vis.doc_border[1][1]) },
+            'bot_left': { 'x': float(vis.doc_border[3][0]), 'y': float(vis.doc_border[3][1]) },
+            'bot_right': { 'x': float(vis.doc_border[2][0]), 'y': float(vis.doc_border[2][1]) }
+        } if vis.doc_border is not None else None,
+        'img_scale': vis.image_scale,
+        'corrected_perspective': vis.is_corrected_perspective,
+        'orig_img_bytes': base64.b64encode(vis.orig_img_bytes).decode("utf-8"),
+        'processed_img_bytes': base64.b64encode(vis.process_img_bytes).decode("utf-8")
+    }
+
 @app.route('/')
 def hello():
     """Return a friendly HTTP greeting."""
@@ -90,44 +106,65 @@ def upload_file():
     if not file or not allowed_file(file.filename):
         return "File extension not allowed", 400
 
-    vis = Vision(file)
-    if not hasattr(vis, 'word_list'):
-        return '%s.%s' % (vis.file_name, vis.file_ext) + ' has Bad Image Data', 400
+    if file.filename.rsplit('.', 1)[1].lower() == 'pdf':
+        # multi-page pdfs are streamed page by page and merged into one document
+        first_page = request.form.get('first_page', '')
+        last_page = request.form.get('last_page', '')
+        reader = PdfReader(file,
+                           first_page=int(first_page) if first_page.isdigit() else None,
+                           last_page=int(last_page) if last_page.isdigit() else None)
+        file_desc = '%s.%s' % (reader.file_name, reader.file_ext)
+        d = reader.get_document(WORD_EMBEDDINGS)
+        if not d:
+            return file_desc + ' has Bad Image Data', 400
+        vis = reader.vision
+        paragraph_list = reader.paragraph_list
+    else:
+        vis = Vision(file)
+        file_desc = '%s.%s' % (vis.file_name, vis.file_ext)
+        if not hasattr(vis, 'word_list'):
+            return file_desc + ' has Bad Image Data', 400
+
+        p = vis.paragraph_helper
+        paragraph_list = p.get_paragraph_list()
+        d = Document(paragraph_list, p.avg_symbol_width, p.avg_symbol_height, WORD_EMBEDDINGS)
 
-    p = vis.get_paragraph_helper()
-    paragraph_list = p.get_paragraph_list()
-    d = Document(paragraph_list, p.avg_symbol_width, p.avg_symbol_height, WORD_EMBEDDINGS)
     terms, definitions = d.create_questions()
 
     if not (terms and definitions):
-        return 'No questions extracted from ' + '%s.%s' % (vis.file_name, vis.file_ext), 400
+        return 'No questions extracted from ' + file_desc, 400
 
     bq_row_obj = {
         'filename': file.filename,
         'ext': file.filename.rsplit('.', 1)[1].lower(),
         'paragraph_list': [paragraph['text'] for paragraph in paragraph_list],
         'doc_struct': json.dumps(DictExporter(attriter=lambda attrs: [(k, v) for k, v in attrs if k == "text"]).export(d.root_node)),
-        'doc_border': {
-            'top_left': { 'x': float(vis.doc_border[0][0]), 'y': float(vis.doc_border[0][1]) },
-            'top_right': { 'x': float(vis.doc_border[1][0]), 'y': float(vis.doc_border[1][1]) },
-            'bot_left': { 'x': float(vis.doc_border[3][0]), 'y': float(vis.doc_border[3][1]) },
-            'bot_right': { 'x': float(vis.doc_border[2][0]), 'y': float(vis.doc_border[2][1]) }
-        } if vis.doc_border is not None else None,
-        'img_scale': vis.image_scale,
-        'corrected_perspective': vis.is_corrected_perspective,
         'terms': terms,
         'definitions': definitions,
         'time_received': datetime.timestamp(datetime.now()),
-        'orig_img_bytes': base64.b64encode(vis.orig_img_bytes).decode("utf-8"),
-        'processed_img_bytes': base64.b64encode(vis.process_img_bytes).decode("utf-8"),
         'ip_address': request.environ['REMOTE_ADDR']
     }
+    if vis:
+        bq_row_obj.update(get_vision_log(vis))
+        # the upload table has no columns for these, so they only go to the log
+        print('Vision stage timings: %s, OCR payload bytes: %s' % (vis.timings, vis.payload_bytes))
 
     log_upload_req([bq_row_obj])
 
     return jsonify({'terms': terms, 'definitions': definitions})
 
 
+@app.route('/stats')
+def get_stats():
+    """Returns the stats of the shared API clients and caches of this worker"""
+    return jsonify({
+        'clients': clients.get_stats(),
+        'preprocess_pool': Vision.preprocess_pool.get_stats(),
+        'nlp_cache': Word.nlp_cache.get_stats(),
+        'sentence_vector_cache': text_summarize.sentence_vector_cache.get_stats()
+    })
+
+
 @app.route('/question_set', methods=['POST'])
 def get_question_set():
     body = request.get_json()
@@ -78,7 +78,7 @@ def test_case(path):
     results['image_scale'] = vis.image_scale
     #results['doc_border'] = vis.doc_border
 
-    p = vis.get_paragraph_helper()
+    p = vis.paragraph_helper
     paragraph_list = p.get_paragraph_list()
     vis.update_processed_img(paragraph_list)
 
@@ -0,0 +1,15 @@
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# the NLP cache of the tests is only kept in memory
+os.environ.setdefault('NLP_CACHE_PATH', '')
+
+# the Google Cloud and gRPC packages are stubbed when they are not installed
+# so the modules that import them can be tested without the API clients
+for name in ('google', 'google.cloud', 'google.cloud.vision', 'google.cloud.language', 'google.cloud.bigquery', 'grpc'):
+    try:
+        __import__(name)
+    except ImportError:
+        sys.modules[name] = mock.MagicMock(name=name)
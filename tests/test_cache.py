@@ -0,0 +1,94 @@
+import pytest
+
+from lib import Cache
+from lib.Cache import LRUCache, DiskCache, TieredCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replaces the time of the cache module with a clock that only moves when it is advanced
+    """
+    now = [1000.0]
+    monkeypatch.setattr(Cache.time, 'time', lambda: now[0])
+    return now
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_items=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    stats = cache.get_stats()
+    assert stats['items'] == 2
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3
+    assert stats['misses'] == 1
+
+def test_lru_set_replaces_without_evicting():
+    cache = LRUCache(max_items=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.set('a', 3)
+    assert cache.get('a') == 3
+    assert cache.get('b') == 2
+    assert cache.get_stats()['evictions'] == 0
+
+def test_lru_ttl_expires(clock):
+    cache = LRUCache(max_items=10, ttl=60)
+    cache.set('a', 1)
+    clock[0] += 59
+    assert cache.get('a') == 1
+    clock[0] += 2
+    assert cache.get('a', 'expired') == 'expired'
+    assert cache.get_stats()['items'] == 0
+
+def test_lru_without_ttl_never_expires(clock):
+    cache = LRUCache(max_items=10)
+    cache.set('a', 1)
+    clock[0] += 365 * 24 * 60 * 60
+    assert cache.get('a') == 1
+
+def test_disk_evicts_least_recently_accessed(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / 'cache.sqlite'), max_bytes=30)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key * 10)
+        clock[0] += 1
+    assert cache.get('a') == 'a' * 10
+    clock[0] += 1
+    cache.set('d', 'd' * 10)
+
+    # 40 bytes are evicted down to 90% of max_bytes, b is the least recently accessed
+    assert cache.get('b') is None
+    assert cache.get('c') is None
+    assert cache.get('a') == 'a' * 10
+    assert cache.get('d') == 'd' * 10
+    stats = cache.get_stats()
+    assert stats['bytes'] == 20
+    assert stats['evictions'] == 2
+
+def test_disk_is_shared_by_connections(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    DiskCache(path).set('a', b'value')
+    assert DiskCache(path).get('a') == b'value'
+
+def test_tiered_promotes_disk_hits(tmp_path):
+    disk = DiskCache(str(tmp_path / 'cache.sqlite'))
+    disk.set('a', 'value')
+    cache = TieredCache(LRUCache(max_items=10), disk)
+
+    assert cache.get('a') == 'value'
+    assert cache.memory.get('a') == 'value'
+    assert cache.get('a') == 'value'
+    assert disk.get_stats()['hits'] == 1
+    assert cache.get('b', 'missing') == 'missing'
+
+def test_tiered_without_disk():
+    cache = TieredCache(LRUCache(max_items=10))
+    cache.set('a', 'value')
+    assert cache.get('a') == 'value'
+    assert cache.get_stats()['disk'] is None
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from lib.scripts import clients
+
+
+class StubClient:
+    # no gRPC channel, so warmup does not wait for it
+    transport = None
+
+class StubBigQueryClient(StubClient):
+    def dataset(self, name):
+        return StubRef([name])
+
+    def get_table(self, table_ref):
+        return ('table', tuple(table_ref.path))
+
+class StubRef:
+    def __init__(self, path):
+        self.path = path
+
+    def table(self, name):
+        return StubRef(self.path + [name])
+
+@pytest.fixture(autouse=True)
+def stub_clients(monkeypatch):
+    monkeypatch.setattr(clients.vision, 'ImageAnnotatorClient', StubClient)
+    monkeypatch.setattr(clients.language, 'LanguageServiceClient', StubClient)
+    monkeypatch.setattr(clients.bigquery, 'Client', StubBigQueryClient)
+    monkeypatch.setattr(clients, '_pid', None)
+
+def run_with_timeout(func, timeout=5):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('value', func()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), '%s did not return in %s seconds' % (func.__name__, timeout)
+    return result.get('value')
+
+def test_get_upload_table():
+    table = run_with_timeout(clients.get_upload_table)
+    assert table == ('table', ('logs', 'upload_post_requests'))
+    assert run_with_timeout(clients.get_upload_table) is table
+    assert clients.get_stats()['upload_table'] == {'created': 1, 'reused': 1}
+    assert clients.get_stats()['bigquery'] == {'created': 1, 'reused': 0}
+
+def test_warmup():
+    run_with_timeout(clients.warmup)
+    stats = clients.get_stats()
+    for name in ('vision', 'language', 'bigquery', 'upload_table'):
+        assert stats[name]['created'] == 1
+
+def test_threads_share_one_client():
+    start = threading.Barrier(8)
+    results = []
+    def get_client():
+        start.wait()
+        results.append(clients.get_vision_client())
+    threads = [threading.Thread(target=get_client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 8
+    assert all([client is results[0] for client in results])
+    assert clients.get_stats()['vision'] == {'created': 1, 'reused': 7}
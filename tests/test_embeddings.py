@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+
+from lib.scripts import embeddings
+
+
+def save_store(prefix, scale=1):
+    embeddings.save(prefix, ['cell', 'atom'], np.eye(2, 3, dtype=np.float32) * scale)
+
+def test_load(tmp_path):
+    prefix = str(tmp_path / 'store')
+    save_store(prefix)
+    word_embeddings = embeddings.load(prefix)
+    assert list(word_embeddings) == ['atom', 'cell']
+    assert word_embeddings['cell'].tolist() == [1, 0, 0]
+    assert word_embeddings.get('gene') is None
+
+def test_version_changes_with_the_files(tmp_path):
+    prefix = str(tmp_path / 'store')
+    save_store(prefix)
+    version = embeddings.load(prefix).version
+    assert embeddings.load(prefix).version == version
+
+    save_store(prefix, scale=2)
+    for path in embeddings.get_paths(prefix):
+        os.utime(path, (0, os.path.getmtime(path) + 10))
+    assert embeddings.load(prefix).version != version
+
+def test_stores_in_memory_have_unique_versions():
+    vocab = np.array([b'atom', b'cell'])
+    vectors = np.zeros((2, 3), dtype=np.float32)
+    versions = set([embeddings.WordEmbeddings(vocab, vectors).version for _ in range(100)])
+    assert len(versions) == 100
@@ -0,0 +1,20 @@
+import numpy as np
+
+from lib.scripts import mapper
+
+
+def test_points_in_square():
+    square = [[0, 0], [10, 0], [10, 10], [0, 10]]
+    pts = [[5, 5], [0.5, 9.5], [-1, 5], [11, 5], [5, -1], [5, 11], [-5, 0], [-5, 10]]
+    assert mapper.points_in_polygon(pts, square).tolist() == [True, True, False, False, False, False, False, False]
+
+def test_points_beside_vertical_and_horizontal_edges():
+    # points left of the polygon but above or below it do not cross its vertical edges
+    square = [[0, 0], [10, 0], [10, 10], [0, 10]]
+    pts = [[-5, -5], [-5, 15], [5, 20]]
+    assert not mapper.points_in_polygon(pts, square).any()
+
+def test_points_in_rotated_quad():
+    quad = np.array([[5, 0], [10, 5], [5, 10], [0, 5]])
+    pts = [[5, 5], [2, 5], [8, 4], [1, 1], [9, 9], [12, 5], [5, 12]]
+    assert mapper.points_in_polygon(pts, quad).tolist() == [True, True, True, False, False, False, False]
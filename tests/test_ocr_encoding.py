@@ -0,0 +1,76 @@
+import glob
+import io
+import math
+import os
+
+import numpy as np
+import cv2
+import pytest
+from PIL import Image
+
+from lib.scripts import img_process
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static', 'img', 'examples')
+EXAMPLE_IMAGES = sorted(glob.glob(os.path.join(EXAMPLES_DIR, '**', '*.*'), recursive=True))
+# Vision.max_pix_area
+MAX_PIX_AREA = 1200*1200
+
+
+def make_page():
+    page = np.full((400, 600, 3), 255, dtype=np.uint8)
+    for i in range(10):
+        cv2.putText(page, 'The cell is the unit of life %s' % i, (10, 30 + 36 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    return page
+
+def make_photo():
+    rng = np.random.RandomState(0)
+    photo = cv2.GaussianBlur(rng.randint(0, 256, size=(400, 600, 3)).astype(np.uint8), (5, 5), 0)
+    return cv2.addWeighted(photo, 0.5, make_page(), 0.5, 0)
+
+def test_flat_page_is_png():
+    assert img_process.get_ocr_format(make_page()) == 'png'
+    assert img_process.get_ocr_format(cv2.cvtColor(make_page(), cv2.COLOR_BGR2GRAY)) == 'png'
+
+def test_photo_is_jpeg():
+    assert img_process.get_ocr_format(make_photo()) == 'jpeg'
+
+def test_encode_for_ocr_keeps_size_by_default():
+    content, ocr_image = img_process.encode_for_ocr(make_page(), glyph_height=60)
+    assert ocr_image.shape == (400, 600)
+    decoded = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    assert np.array_equal(decoded, ocr_image)
+
+def test_encode_for_ocr_keeps_color(monkeypatch):
+    monkeypatch.setattr(img_process, 'OCR_GRAYSCALE', 0)
+    page = make_page()
+    content, ocr_image = img_process.encode_for_ocr(page)
+    assert ocr_image is page
+
+def get_baseline_bytes(path):
+    """
+    Size of the upload as it was sent before, resized and saved by PIL in its own format
+    """
+    image = Image.open(path)
+    area = image.size[0] * image.size[1]
+    if area > MAX_PIX_AREA:
+        ratio = math.sqrt(MAX_PIX_AREA / area)
+        image = image.resize((int(image.size[0] * ratio), int(image.size[1] * ratio)), Image.LANCZOS)
+    ext = os.path.splitext(path)[1].lower().replace('.', '').replace('jpg', 'jpeg')
+    with io.BytesIO() as output:
+        image.save(output, format=ext)
+        return len(output.getvalue())
+
+@pytest.mark.parametrize('path', EXAMPLE_IMAGES, ids=lambda path: os.path.relpath(path, EXAMPLES_DIR))
+def test_payload_not_larger_than_baseline(path):
+    with open(path, 'rb') as f:
+        image = img_process.resize_to_area(img_process.decode_image(f.read(), MAX_PIX_AREA), MAX_PIX_AREA)
+    content, ocr_image = img_process.encode_for_ocr(image)
+    assert len(content) <= get_baseline_bytes(path)
+
+def test_encode_for_ocr_scales_to_glyph_height(monkeypatch):
+    monkeypatch.setattr(img_process, 'OCR_GLYPH_HEIGHT', 24)
+    monkeypatch.setattr(img_process, 'OCR_GRAYSCALE', 1)
+    content, ocr_image = img_process.encode_for_ocr(make_page(), glyph_height=48)
+    assert ocr_image.shape == (200, 300)
+    content, ocr_image = img_process.encode_for_ocr(make_page(), glyph_height=20)
+    assert ocr_image.shape == (400, 600)
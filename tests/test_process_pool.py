@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from lib.ProcessPool import ProcessPool, ProcessPoolError
+
+
+def sleep_and_return(seconds, value):
+    time.sleep(seconds)
+    return value
+
+def run_concurrently(pool, num_tasks, seconds):
+    results = [None] * num_tasks
+    def run(i):
+        try:
+            results[i] = pool.run(sleep_and_return, seconds, i)
+        except ProcessPoolError as e:
+            results[i] = str(e)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(num_tasks)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_tasks_above_queue_depth_wait_for_a_slot():
+    pool = ProcessPool(1, 2, timeout=10)
+    try:
+        assert run_concurrently(pool, 6, 0.1) == list(range(6))
+        stats = pool.get_stats()
+        assert stats['completed'] == 6
+        assert stats['queue_full'] == 0
+    finally:
+        pool.reset()
+
+def test_fallbacks_are_counted():
+    pool = ProcessPool(1, 0, timeout=0.2)
+    try:
+        # the first task times out and holds the only slot until it finishes
+        results = run_concurrently(pool, 2, 1)
+        assert sorted([result.split(' ')[0] for result in results]) == ['queue', 'task']
+        stats = pool.get_stats()
+        assert stats['queue_full'] == 1
+        assert stats['timed_out'] == 1
+        assert stats['completed'] == 0
+    finally:
+        pool.reset()
+
+def test_inline_pool():
+    pool = ProcessPool(0, 0)
+    assert pool.run(sleep_and_return, 0, 'value') == 'value'
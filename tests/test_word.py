@@ -0,0 +1,72 @@
+import pytest
+
+from lib.Cache import LRUCache, TieredCache
+from lib.Word import Word
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """
+    Replaces the NLP request with one whose salience depends on the whole
+    text of the request, like the salience of the NLP API
+    """
+    request_list = []
+    def annotate_text(text):
+        request_list.append(text)
+        words = text.split(' ')
+        syntax_list = [[Word(text=word)] for word in words]
+        entity_list = [{'salience': 1 / len(words)} for word in words]
+        return syntax_list, entity_list
+    monkeypatch.setattr(Word, 'annotate_text', staticmethod(annotate_text))
+    monkeypatch.setattr(Word, 'nlp_cache', TieredCache(LRUCache(max_items=100)))
+    return request_list
+
+def test_annotate_segments_in_order(requests):
+    syntax_list, entity_list = Word.annotate_segments(['one two', 'three', 'four five six'])
+    assert [words[0].content for words in syntax_list] == ['one', 'two', 'three', 'four', 'five', 'six']
+    assert len(entity_list) == 6
+
+def test_annotate_segments_packs_misses_into_one_request(requests):
+    Word.annotate_segments(['one two', 'three', 'four five six'])
+    assert requests == ['one two three four five six']
+
+def test_cached_salience_is_the_salience_of_its_batch(requests):
+    together = Word.annotate_segments(['one two', 'three four five'])[1]
+    assert Word.annotate_segments(['one two'])[1] == together[:2]
+    assert requests == ['one two three four five']
+
+def test_annotate_segments_only_requests_misses(requests):
+    Word.annotate_segments(['one two', 'three'])
+    del requests[:]
+    Word.annotate_segments(['three', 'four', 'one two'])
+    assert requests == ['four']
+
+def check_pieces(segment, max_bytes):
+    piece_list = Word.split_segment(segment, max_bytes)
+    assert ' '.join(piece_list) == segment
+    for piece in piece_list:
+        assert len(piece.encode('utf-8')) <= max_bytes
+    return piece_list
+
+def test_split_segment_that_fits():
+    assert Word.split_segment('One. Two.', 9) == ['One. Two.']
+
+def test_split_segment_at_sentence_ends():
+    segment = 'The cell is small. It has a wall. Plants make food from light. Animals eat.'
+    piece_list = check_pieces(segment, 40)
+    assert piece_list == ['The cell is small. It has a wall.', 'Plants make food from light.', 'Animals eat.']
+
+def test_split_segment_carried_words_near_max_bytes():
+    # the words carried after a sentence end are close to max_bytes, so the
+    # next word does not fit with them
+    segment = 'Aa. bbbbbbbbbb cccccccccc dddddddddd. Ee ff. Gg.'
+    piece_list = check_pieces(segment, 30)
+    assert piece_list == ['Aa.', 'bbbbbbbbbb cccccccccc', 'dddddddddd. Ee ff. Gg.']
+
+def test_split_segment_multibyte_sentences():
+    sentence = 'Die Größe der Zelle ist überall gleich.'
+    segment = ' '.join([sentence] * 20)
+    for max_bytes in range(len(sentence.encode('utf-8')), 200, 7):
+        piece_list = check_pieces(segment, max_bytes)
+        for piece in piece_list:
+            assert piece.endswith('.')